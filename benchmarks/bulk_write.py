@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Insert throughput of `MongoRepository.insert_many` against `insert_one` loop, on in-memory Motor stand-in
+that keeps documents in dict and charges `--latency` ms per round trip.
+
+    PYTHONPATH=. python benchmarks/bulk_write.py --documents 100000 --latency 0.5
+"""
+import argparse
+import asyncio
+from time import perf_counter
+from typing import (
+    Any,
+    Dict,
+    List,
+)
+
+from bson import CodecOptions
+from pymongo import InsertOne
+
+from maio.lib.repository import MongoRepository
+
+
+class InsertResult:
+    __slots__ = ('inserted_id',)
+
+    def __init__(self, inserted_id: Any):
+        self.inserted_id = inserted_id
+
+
+class MemoryCollection:
+    """
+    Only what `MongoRepository` insert paths call, every call costs one round trip
+    """
+    __slots__ = ('name', 'latency', 'codec_options', 'documents', 'round_trips')
+
+    def __init__(self, name: str, latency: float, codec_options: CodecOptions = CodecOptions()):
+        self.name = name
+        self.latency = latency
+        self.codec_options = codec_options
+        self.documents: Dict[Any, Any] = {}
+        self.round_trips = 0
+
+    def with_options(self, codec_options: CodecOptions) -> 'MemoryCollection':
+        collection = MemoryCollection(self.name, self.latency, codec_options)
+        collection.documents = self.documents
+        return collection
+
+    async def _round_trip(self):
+        self.round_trips += 1
+        await asyncio.sleep(self.latency)
+
+    async def insert_one(self, document: Dict) -> InsertResult:
+        await self._round_trip()
+        self.documents[document['_id']] = document
+        return InsertResult(document['_id'])
+
+    async def bulk_write(self, operations: List[InsertOne], ordered: bool = True):
+        await self._round_trip()
+        for operation in operations:
+            document = operation._doc
+            self.documents[document['_id']] = document
+
+
+class MemoryDatabase:
+    __slots__ = ('latency', 'collections')
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.collections: Dict[str, MemoryCollection] = {}
+
+    def get_collection(self, name: str) -> MemoryCollection:
+        if name not in self.collections:
+            self.collections[name] = MemoryCollection(name, self.latency)
+        return self.collections[name]
+
+
+class EventRepository(MongoRepository):
+    __slots__ = ()
+    __collection__ = 'events'
+
+
+def documents(count: int) -> List[Dict]:
+    return [{'user': index % 1000, 'kind': 'click', 'payload': {'x': index, 'y': -index, 'tags': ['a', 'b']}} for index in range(count)]
+
+
+async def insert_one_loop(repository: EventRepository, batch: List[Dict]):
+    for document in batch:
+        await repository.insert_one(document)
+
+
+async def insert_many(repository: EventRepository, batch: List[Dict]):
+    await repository.insert_many(batch)
+
+
+async def run(count: int, latency: float):
+    for name, insert in (('insert_one loop', insert_one_loop), ('insert_many', insert_many)):
+        database = MemoryDatabase(latency / 1000)
+        repository = EventRepository(database)
+        batch = documents(count)
+
+        started = perf_counter()
+        await insert(repository, batch)
+        seconds = perf_counter() - started
+
+        collection = database.get_collection(EventRepository.__collection__)
+        print(f"{name:>16}: {count / seconds:,.0f} documents/s, {collection.round_trips} round trips, {len(collection.documents)} stored")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--documents', type=int, default=100000)
+    parser.add_argument('--latency', type=float, default=0.5, help="round trip in ms")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.documents, args.latency))
+
+
+if __name__ == '__main__':
+    main()
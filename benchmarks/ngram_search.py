@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+Search latency of `NgramSearch.match()` multikey lookups against `Mongo.match_string_contains` regex scans
+on generated collection, needs running Mongo server.
+
+    PYTHONPATH=. python benchmarks/ngram_search.py --uri mongodb://localhost:27017 --documents 1000000
+
+Collection is dropped at the end unless `--keep` is given, a kept one is reused by the next run.
+"""
+import argparse
+import asyncio
+import random
+import string
+from time import perf_counter
+from typing import (
+    Dict,
+    List,
+)
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from maio.lib.repository import Mongo
+from maio.lib.search import NgramSearch
+
+SEARCH = NgramSearch(['name', 'email'])
+COLLECTION = 'ngram_benchmark'
+
+
+def word(rng: random.Random, length: int) -> str:
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def document(rng: random.Random) -> Dict:
+    first, last = word(rng, rng.randint(3, 9)), word(rng, rng.randint(4, 12))
+    return {'name': f'{first.title()} {last.title()}', 'email': f'{first}.{last}@{word(rng, 6)}.com'}
+
+
+async def populate(collection, count: int, batch_size: int = 10000):
+    rng = random.Random(42)
+    existing = await collection.estimated_document_count()
+
+    for start in range(existing, count, batch_size):
+        batch = [document(rng) for _ in range(min(batch_size, count - start))]
+        for element in batch:
+            element[SEARCH.target] = SEARCH.tokens(element)
+        await collection.insert_many(batch, ordered=False)
+        print(f"inserted {start + len(batch)} of {count}", end='\r')
+
+    await collection.create_indexes([SEARCH.index().to_model()])
+    print()
+
+
+async def sample_terms(collection, count: int) -> List[str]:
+    rng = random.Random(7)
+    documents = await collection.aggregate([{'$sample': {'size': count}}, {'$project': {'name': 1}}]).to_list(count)
+    terms = []
+    for element in documents:
+        name = element['name'].lower()
+        start = rng.randint(0, max(0, len(name) - 5))
+        terms.append(name[start:start + 5])
+    return terms
+
+
+async def measure(collection, name: str, queries: List[Dict], limit: int):
+    started = perf_counter()
+    found = 0
+    for query in queries:
+        found += len(await collection.find(query, {'_id': 1}).limit(limit).to_list(limit))
+    seconds = perf_counter() - started
+
+    print(f"{name:>6}: {seconds / len(queries) * 1000:.1f} ms per search, {found / len(queries):.1f} results on average")
+
+
+async def run(uri: str, database: str, count: int, searches: int, limit: int, keep: bool):
+    client = AsyncIOMotorClient(uri)
+    collection = client.get_database(database).get_collection(COLLECTION)
+
+    try:
+        await populate(collection, count)
+        terms = await sample_terms(collection, searches)
+
+        await measure(collection, 'regex', [{'name': Mongo.match_string_contains(term)} for term in terms], limit)
+        await measure(collection, 'ngram', [SEARCH.match(term) for term in terms], limit)
+    finally:
+        if not keep:
+            await collection.drop()
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--uri', default='mongodb://localhost:27017')
+    parser.add_argument('--database', default='maio_benchmark')
+    parser.add_argument('--documents', type=int, default=1000000)
+    parser.add_argument('--searches', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=25)
+    parser.add_argument('--keep', action='store_true')
+    args = parser.parse_args()
+
+    asyncio.run(run(args.uri, args.database, args.documents, args.searches, args.limit, args.keep))
+
+
+if __name__ == '__main__':
+    main()
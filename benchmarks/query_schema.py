@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+Parsing time of typical list query with compiled `QuerySchema` and with chained `QueryParams` getters.
+
+    PYTHONPATH=. python benchmarks/query_schema.py --number 100000
+"""
+import argparse
+import timeit
+from enum import Enum
+
+from multidict import MultiDict
+
+from maio.lib.request.pagination import Sort
+from maio.lib.request.query_params import QueryParams
+from maio.lib.request.query_schema import (
+    BoolField,
+    DateRangeField,
+    EnumField,
+    IntField,
+    ListField,
+    QuerySchema,
+    StrField,
+)
+
+AVAILABLE_SORT = {'name', 'created'}
+DEFAULT_SORT = Sort.desc('created')
+
+
+class Status(Enum):
+    ACTIVE = 1
+    BLOCKED = 2
+
+
+SCHEMA = QuerySchema({
+    'active': BoolField(),
+    'age': IntField(min_val=0),
+    'status': EnumField(Status),
+    'tags': ListField(),
+    'created': DateRangeField(),
+    'search': StrField(min_len=3),
+}, available_sort=AVAILABLE_SORT, default_sort=DEFAULT_SORT)
+
+
+class FakeRequest:
+    __slots__ = ('query',)
+
+    def __init__(self, query: MultiDict):
+        self.query = query
+
+
+def chained(request: FakeRequest):
+    params = QueryParams.from_request(request, AVAILABLE_SORT, DEFAULT_SORT)
+    return (
+        params.get_bool('active'),
+        params.get_int('age'),
+        params.get_enum('status', Status),
+        params.get_list('tags'),
+        params.get_date_range('created'),
+        params.get('search', min_len=3),
+        params.get_sort(),
+        params.get_pagination(),
+    )
+
+
+def compiled(request: FakeRequest):
+    return SCHEMA.parse(request)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=100000)
+    args = parser.parse_args()
+
+    request = FakeRequest(MultiDict([
+        ('active', 'true'), ('age', '42'), ('status', 'active'), ('tags', 'a,b,c'),
+        ('createdFrom', '01-01-2024'), ('createdEnd', '31-12-2024'), ('search', 'alice'),
+        ('sort', 'name'), ('order', 'asc'), ('limit', '20'), ('page', '3'),
+        ('utm_source', 'mail'), ('utm_campaign', 'spring'),
+    ]))
+
+    for name, function in (('chained getters', chained), ('compiled schema', compiled)):
+        seconds = min(timeit.repeat(lambda: function(request), number=args.number, repeat=5))
+        print(f"{name:>16}: {seconds / args.number * 1e6:.2f} us per query")
+
+
+if __name__ == '__main__':
+    main()
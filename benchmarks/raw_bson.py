@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+Decode time and allocations of reading few fields from large documents, fully decoded with `bson.decode`
+and lazily with `RawBSONDocument` plus `document_mapper`. No Mongo server needed.
+
+    PYTHONPATH=. python benchmarks/raw_bson.py --documents 1000 --items 500
+"""
+import argparse
+import timeit
+import tracemalloc
+from datetime import datetime
+from typing import (
+    Callable,
+    Dict,
+    List,
+)
+from uuid import uuid4
+
+import bson
+from bson import (
+    CodecOptions,
+    ObjectId,
+)
+from bson.binary import UuidRepresentation
+from bson.raw_bson import RawBSONDocument
+
+from maio.lib.repository import document_mapper
+
+CODEC_OPTIONS = CodecOptions(uuid_representation=UuidRepresentation.STANDARD)
+
+
+class Summary:
+    __slots__ = ('id', 'user_id', 'valid_till', 'city')
+
+    def __init__(self, id, user_id, valid_till, city):
+        self.id = id
+        self.user_id = user_id
+        self.valid_till = valid_till
+        self.city = city
+
+
+MAPPER = document_mapper(Summary, {'id': '_id', 'user_id': 'container.user_id', 'valid_till': 'valid_till', 'city': 'profile.address.city'})
+
+
+def payload(items: int) -> Dict:
+    return {
+        '_id': uuid4(),
+        'valid_till': datetime.utcnow(),
+        'container': {'user_id': ObjectId(), 'roles': ['admin', 'editor']},
+        'profile': {'address': {'city': 'Warsaw', 'street': 'Main 1'}, 'bio': 'x' * 512},
+        'history': [{'at': datetime.utcnow(), 'action': 'login', 'ip': '10.0.0.1', 'meta': {'agent': 'y' * 64}} for _ in range(items)],
+    }
+
+
+def full(raw: List[bytes]):
+    return [MAPPER(bson.decode(data, codec_options=CODEC_OPTIONS)) for data in raw]
+
+
+def lazy(raw: List[bytes]):
+    return [MAPPER(RawBSONDocument(data, codec_options=CODEC_OPTIONS)) for data in raw]
+
+
+def allocated(function: Callable, raw: List[bytes]):
+    tracemalloc.start()
+    function(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--documents', type=int, default=1000)
+    parser.add_argument('--items', type=int, default=500, help="entries of nested history array per document")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    raw = [bson.encode(payload(args.items), codec_options=CODEC_OPTIONS) for _ in range(args.documents)]
+    print(f"{args.documents} documents of {len(raw[0]) / 1024:.0f} KiB")
+
+    for name, function in (('bson.decode', full), ('RawBSONDocument', lazy)):
+        seconds = min(timeit.repeat(lambda: function(raw), number=1, repeat=args.repeat))
+        peak = allocated(function, raw)
+        print(f"{name:>16}: {seconds / args.documents * 1e6:.1f} us per document, peak {peak / 1024 / 1024:.1f} MiB allocated")
+
+
+if __name__ == '__main__':
+    main()
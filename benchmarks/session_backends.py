@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""
+Session lookup throughput of session backends under concurrent load of several worker processes.
+`remote` is in-memory stand-in of `SessionMongoRepository` charging `--latency` ms per call,
+tiered backends start empty and fill their local tier from it.
+
+    PYTHONPATH=. python benchmarks/session_backends.py --workers 4 --lookups 50000 --sessions 10000
+"""
+import argparse
+import asyncio
+import multiprocessing
+import random
+from datetime import (
+    datetime,
+    timedelta,
+)
+from time import perf_counter
+from typing import (
+    List,
+    Optional,
+    Tuple,
+)
+from uuid import UUID
+
+from maio.lib.session.backend import (
+    MemorySessionBackend,
+    SessionBackend,
+    SharedMemorySessionBackend,
+    TieredSessionBackend,
+)
+from maio.lib.session.model import (
+    DefaultSessionContainer,
+    Session,
+)
+
+BACKENDS = ('remote', 'memory', 'shared', 'tiered-memory', 'tiered-shared')
+
+
+class RemoteBackend(MemorySessionBackend):
+    """
+    Stand-in of Mongo repository, every call costs one round trip
+    """
+    __slots__ = ('latency', 'round_trips')
+
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+        self.round_trips = 0
+
+    async def get_by_id(self, session_id: UUID) -> Optional[Session]:
+        self.round_trips += 1
+        await asyncio.sleep(self.latency)
+        return await super().get_by_id(session_id)
+
+
+def sessions(count: int) -> List[Session]:
+    rng = random.Random(42)
+    valid_till = datetime.utcnow() + timedelta(hours=1)
+    return [Session(UUID(int=rng.getrandbits(128)), valid_till, DefaultSessionContainer(index), 'token', True) for index in range(count)]
+
+
+async def load(backend: SessionBackend, stored: List[Session]):
+    for session in stored:
+        await backend.insert(session)
+
+
+async def work(kind: str, memory_name: str, args: argparse.Namespace, seed: int) -> Tuple[int, int, float]:
+    stored = sessions(args.sessions)
+    remote = RemoteBackend(args.latency / 1000)
+    await load(remote, stored)
+
+    shared = SharedMemorySessionBackend(memory_name, args.slots) if kind.endswith('shared') else None
+    if kind == 'remote':
+        backend = remote
+    elif kind == 'memory':
+        backend = MemorySessionBackend()
+        await load(backend, stored)
+    elif kind == 'shared':
+        backend = shared
+    elif kind == 'tiered-memory':
+        backend = TieredSessionBackend(MemorySessionBackend(), remote, args.local_ttl)
+    else:
+        backend = TieredSessionBackend(shared, remote, args.local_ttl)
+
+    rng = random.Random(seed)
+    ids = [stored[rng.randrange(len(stored))].id for _ in range(args.lookups)]
+
+    async def client(offset: int):
+        for index in range(offset, len(ids), args.concurrency):
+            await backend.get_by_id(ids[index])
+
+    started = perf_counter()
+    await asyncio.gather(*(client(offset) for offset in range(args.concurrency)))
+    seconds = perf_counter() - started
+
+    if shared:
+        shared.close()
+
+    return len(ids), remote.round_trips, seconds
+
+
+def worker(kind: str, memory_name: str, args: argparse.Namespace, seed: int) -> Tuple[int, int, float]:
+    return asyncio.run(work(kind, memory_name, args, seed))
+
+
+def run(kind: str, args: argparse.Namespace):
+    memory_name = f'maio_benchmark_{kind}'
+    SharedMemorySessionBackend.unlink(memory_name)
+
+    if kind == 'shared':
+        # shared block alone has no remote to fill it from, load it once for all workers
+        backend = SharedMemorySessionBackend(memory_name, args.slots)
+        asyncio.run(load(backend, sessions(args.sessions)))
+        backend.close()
+
+    try:
+        with multiprocessing.Pool(args.workers) as pool:
+            results = pool.starmap(worker, [(kind, memory_name, args, seed) for seed in range(args.workers)])
+    finally:
+        SharedMemorySessionBackend.unlink(memory_name)
+
+    lookups = sum(result[0] for result in results)
+    round_trips = sum(result[1] for result in results)
+    seconds = max(result[2] for result in results)
+
+    print(f"{kind:>14}: {lookups / seconds:,.0f} lookups/s, {round_trips} remote calls")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--lookups', type=int, default=50000, help="per worker")
+    parser.add_argument('--sessions', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=100, help="concurrent lookups per worker")
+    parser.add_argument('--latency', type=float, default=0.5, help="remote round trip in ms")
+    parser.add_argument('--local-ttl', type=float, default=10)
+    parser.add_argument('--slots', type=int, default=65536)
+    parser.add_argument('--backends', nargs='*', choices=BACKENDS, default=BACKENDS)
+    args = parser.parse_args()
+
+    for kind in args.backends:
+        run(kind, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+Authenticated request throughput of `SessionManager` with in-process session cache on and off.
+Sessions live in in-memory stand-in of `SessionMongoRepository` charging `--latency` ms per call.
+
+    PYTHONPATH=. python benchmarks/session_cache.py --requests 100000 --sessions 1000 --concurrency 100
+"""
+import argparse
+import asyncio
+from datetime import (
+    datetime,
+    timedelta,
+)
+from time import perf_counter
+from typing import (
+    List,
+    Optional,
+)
+from uuid import (
+    UUID,
+    uuid4,
+)
+
+from multidict import MultiDict
+
+from maio.lib.configs.mongo import MongoConfig
+from maio.lib.session.backend import MemorySessionBackend
+from maio.lib.session.config import SessionConfig
+from maio.lib.session.model import (
+    DefaultSessionContainer,
+    Session,
+)
+from maio.lib.session.service import (
+    HeaderSessionStore,
+    SessionManager,
+)
+
+SUFFIX = 'user'
+
+
+class RemoteBackend(MemorySessionBackend):
+    """
+    Stand-in of Mongo repository, every call costs one round trip
+    """
+    __slots__ = ('latency', 'round_trips')
+
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+        self.round_trips = 0
+
+    async def _round_trip(self):
+        self.round_trips += 1
+        await asyncio.sleep(self.latency)
+
+    async def get_by_id(self, session_id: UUID) -> Optional[Session]:
+        await self._round_trip()
+        return await super().get_by_id(session_id)
+
+    async def update_active_valid_till_by_id(self, valid_till: datetime, session_id: UUID) -> Optional[Session]:
+        await self._round_trip()
+        return await super().update_active_valid_till_by_id(valid_till, session_id)
+
+
+class FakeRequest:
+    __slots__ = ('headers',)
+
+    def __init__(self, header_name: str, session_id: UUID):
+        self.headers = MultiDict([(header_name, str(session_id))])
+
+
+async def run(cache_ttl: Optional[int], requests: int, sessions: int, concurrency: int, latency: float):
+    config = SessionConfig(MongoConfig('mongodb://localhost', 1, 'standard'), 'session', 86400, 'secret', 3600, False,
+                           renew_threshold=0.5, cache_ttl=cache_ttl, cache_size=sessions)
+    backend = RemoteBackend(latency / 1000)
+    store = HeaderSessionStore(config, SUFFIX)
+    manager = SessionManager(config, backend, store)
+
+    prepared: List[FakeRequest] = []
+    for index in range(sessions):
+        session = Session(uuid4(), datetime.utcnow() + timedelta(hours=1), DefaultSessionContainer(index), None, True)
+        await backend.insert(session)
+        prepared.append(FakeRequest(store.header_name, session.id))
+
+    async def client(offset: int):
+        for index in range(offset, requests, concurrency):
+            async with manager.session(prepared[index % sessions]):
+                pass
+
+    started = perf_counter()
+    await asyncio.gather(*(client(offset) for offset in range(concurrency)))
+    seconds = perf_counter() - started
+
+    name = f"cache {cache_ttl} s" if cache_ttl else "no cache"
+    print(f"{name:>12}: {requests / seconds:,.0f} requests/s, {backend.round_trips} repository calls")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=100000)
+    parser.add_argument('--sessions', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.5, help="repository round trip in ms")
+    parser.add_argument('--cache-ttl', type=int, default=60)
+    args = parser.parse_args()
+
+    for cache_ttl in (None, args.cache_ttl):
+        asyncio.run(run(cache_ttl, args.requests, args.sessions, args.concurrency, args.latency))
+
+
+if __name__ == '__main__':
+    main()
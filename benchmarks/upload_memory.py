@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Peak RSS of worker receiving concurrent multipart uploads, with spooling to temporary files on and off.
+
+    PYTHONPATH=. python benchmarks/upload_memory.py --uploads 50 --size 100
+
+Every mode runs in its own process, as peak RSS of process only grows.
+"""
+import argparse
+import asyncio
+import resource
+import subprocess
+import sys
+from time import perf_counter
+
+from aiohttp import (
+    ClientSession,
+    FormData,
+    web,
+)
+
+from maio.lib.request.body_receiver import BodyReceiver
+
+CHUNK = b'\0' * (1024 * 1024)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def payload(size_mb: int):
+    for _ in range(size_mb):
+        yield CHUNK
+
+
+async def run(uploads: int, size_mb: int, spool: bool, port: int) -> dict:
+    max_size = (size_mb + 1) * 1024 * 1024
+    receiver = BodyReceiver(max_size, None, spool_size=BodyReceiver.SPOOL_SIZE if spool else max_size)
+
+    async def handler(request: web.Request) -> web.Response:
+        received = await receiver.receive(request)
+        for upload in received.values():
+            upload.close()
+        return web.Response(text='ok')
+
+    app = web.Application(client_max_size=max_size * 2)
+    app.router.add_post('/', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+
+    async def send(session: ClientSession):
+        form = FormData()
+        form.add_field('file', payload(size_mb), filename='upload.bin', content_type='application/octet-stream')
+        async with session.post(f'http://127.0.0.1:{port}/', data=form) as response:
+            response.raise_for_status()
+
+    baseline = peak_rss_mb()
+    started = perf_counter()
+    try:
+        async with ClientSession() as session:
+            await asyncio.gather(*(send(session) for _ in range(uploads)))
+    finally:
+        await runner.cleanup()
+
+    return {'spool': spool, 'seconds': perf_counter() - started, 'baseline_mb': baseline, 'peak_mb': peak_rss_mb()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--uploads', type=int, default=50)
+    parser.add_argument('--size', type=int, default=100, help="upload size in MB")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--mode', choices=('spool', 'memory'))
+    args = parser.parse_args()
+
+    if args.mode:
+        result = asyncio.run(run(args.uploads, args.size, args.mode == 'spool', args.port))
+        print(f"{args.mode:>6}: peak {result['peak_mb']:.0f} MB (baseline {result['baseline_mb']:.0f} MB) in {result['seconds']:.1f} s")
+        return
+
+    for mode in ('spool', 'memory'):
+        subprocess.run([sys.executable, __file__, '--uploads', str(args.uploads), '--size', str(args.size),
+                        '--port', str(args.port), '--mode', mode], check=True)
+
+
+if __name__ == '__main__':
+    main()
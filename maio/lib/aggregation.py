@@ -0,0 +1,285 @@
+from copy import deepcopy
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Set,
+)
+
+MATCH = '$match'
+PROJECT = '$project'
+GROUP = '$group'
+SORT = '$sort'
+LIMIT = '$limit'
+SKIP = '$skip'
+ADD_FIELDS = '$addFields'
+SET = '$set'
+UNWIND = '$unwind'
+LOOKUP = '$lookup'
+COUNT = '$count'
+REPLACE_ROOT = '$replaceRoot'
+REPLACE_WITH = '$replaceWith'
+
+_LOGICAL = {'$and', '$or', '$nor'}
+_OPAQUE_MATCH = {'$where', '$text', '$jsonSchema', '$comment'}
+_ONE_TO_ONE = {PROJECT, ADD_FIELDS, SET}
+# take field names as string literals, references cannot be found by looking for `$` prefixed strings
+_FIELD_BY_NAME = {'$getField', '$setField', '$unsetField'}
+# conditions that select the same documents before and after grouping by the field,
+# `$exists`, `$type` and others differ for documents where the field is missing
+_GROUP_SAFE = {'$eq', '$in', '$gt', '$gte', '$lt', '$lte'}
+_BARRIERS = {GROUP, COUNT, REPLACE_ROOT, REPLACE_WITH}
+
+_MAX_PASSES = 10
+
+
+class _Unknown(Exception):
+    pass
+
+
+def _operator(stage: Dict) -> str:
+    return next(iter(stage))
+
+
+def _root(path: str) -> str:
+    return path.split('.', 1)[0]
+
+
+def _match_paths(query: Dict) -> Set[str]:
+    paths = set()
+    for key, value in query.items():
+        if key in _LOGICAL:
+            for condition in value:
+                paths.update(_match_paths(condition))
+        elif key == '$expr':
+            paths.update(_expression_refs(value))
+        elif key.startswith('$') or key in _OPAQUE_MATCH:
+            raise _Unknown
+        else:
+            paths.add(key)
+    return paths
+
+
+def _expression_refs(expression: Any) -> Set[str]:
+    if isinstance(expression, str):
+        if expression.startswith('$$'):
+            if expression.startswith('$$ROOT') or expression.startswith('$$CURRENT'):
+                raise _Unknown
+            return set()
+        if expression.startswith('$'):
+            return {expression[1:]}
+        return set()
+    if isinstance(expression, dict):
+        if _FIELD_BY_NAME.intersection(expression):
+            raise _Unknown
+        refs = set()
+        for value in expression.values():
+            refs.update(_expression_refs(value))
+        return refs
+    if isinstance(expression, (list, tuple)):
+        refs = set()
+        for value in expression:
+            refs.update(_expression_refs(value))
+        return refs
+    return set()
+
+
+def _is_flag(value: Any) -> bool:
+    return isinstance(value, (bool, int)) and value in (0, 1)
+
+
+def _is_exclusion(projection: Dict) -> bool:
+    values = [value for key, value in projection.items() if key != '_id']
+    if not values:
+        values = [projection.get('_id', 1)]
+    return all(_is_flag(value) and not value for value in values)
+
+
+def _covers(prefix: str, path: str) -> bool:
+    return path == prefix or path.startswith(f'{prefix}.')
+
+
+def _passes_through(projection: Dict, path: str) -> bool:
+    """
+    Tells if value under `path` is the same before and after `$project`
+    """
+    if _is_exclusion(projection):
+        return not any(_covers(key, path) or _covers(path, key) for key in projection if not projection[key])
+
+    if _covers('_id', path) and '_id' not in projection:
+        return True
+
+    for key, value in projection.items():
+        if _covers(key, path):
+            return _is_flag(value) and bool(value)
+        if _covers(path, key):
+            return False
+    return False
+
+
+def _merge_matches(first: Dict, second: Dict) -> Dict:
+    if not set(first).intersection(second):
+        return {**first, **second}
+    return {'$and': [first, second]}
+
+
+def _group_match(group: Dict, query: Dict) -> Optional[Dict]:
+    """
+    Rewrites `$match` placed after `$group` so it can run before it, possible only for conditions on group `_id` fields
+    """
+    group_id = group.get('_id')
+    rewritten = {}
+
+    for key, condition in query.items():
+        if key.startswith('$'):
+            return None
+        if isinstance(condition, dict) and any(operator.startswith('$') for operator in condition) and not _GROUP_SAFE.issuperset(condition):
+            return None
+
+        if isinstance(group_id, str) and group_id.startswith('$') and not group_id.startswith('$$') and key == '_id':
+            rewritten[group_id[1:]] = condition
+        elif isinstance(group_id, dict) and key.startswith('_id.'):
+            source = group_id.get(key[4:])
+            if not (isinstance(source, str) and source.startswith('$') and not source.startswith('$$')):
+                return None
+            rewritten[source[1:]] = condition
+        else:
+            return None
+
+    return rewritten
+
+
+def _stage_refs(stage: Dict) -> Set[str]:
+    """
+    Root field names read by stage, raises `_Unknown` if that cannot be established
+    """
+    operator = _operator(stage)
+    definition = stage[operator]
+
+    if operator == MATCH:
+        return {_root(path) for path in _match_paths(definition)}
+    if operator == SORT:
+        return {_root(path) for path in definition}
+    if operator in (LIMIT, SKIP, COUNT):
+        return set()
+    if operator == PROJECT:
+        if _is_exclusion(definition):
+            return set()
+        refs = set()
+        for key, value in definition.items():
+            refs.update({_root(key)} if _is_flag(value) else _expression_refs(value))
+        return {_root(ref) for ref in refs}
+    if operator in (ADD_FIELDS, SET, GROUP, REPLACE_ROOT, REPLACE_WITH):
+        return {_root(ref) for ref in _expression_refs(definition)}
+    if operator == UNWIND:
+        path = definition['path'] if isinstance(definition, dict) else definition
+        return {_root(path[1:])}
+    if operator == LOOKUP and 'localField' in definition and 'pipeline' not in definition:
+        return {_root(definition['localField'])}
+    raise _Unknown
+
+
+def _merge_adjacent_matches(stages: List[Dict]) -> bool:
+    for index in range(len(stages) - 1):
+        if _operator(stages[index]) == MATCH and _operator(stages[index + 1]) == MATCH:
+            stages[index] = {MATCH: _merge_matches(stages[index][MATCH], stages[index + 1][MATCH])}
+            del stages[index + 1]
+            return True
+    return False
+
+
+def _push_matches_up(stages: List[Dict]) -> bool:
+    for index in range(1, len(stages)):
+        if _operator(stages[index]) != MATCH:
+            continue
+
+        previous = stages[index - 1]
+        operator = _operator(previous)
+        query = stages[index][MATCH]
+
+        if operator == PROJECT:
+            try:
+                paths = _match_paths(query)
+            except _Unknown:
+                continue
+            if all(_passes_through(previous[PROJECT], path) for path in paths):
+                stages[index - 1], stages[index] = stages[index], previous
+                return True
+
+        elif operator == GROUP:
+            rewritten = _group_match(previous[GROUP], query)
+            if rewritten is not None:
+                stages[index - 1], stages[index] = {MATCH: rewritten}, previous
+                return True
+    return False
+
+
+def _merge_sort_limit(stages: List[Dict]) -> bool:
+    for index in range(len(stages) - 1):
+        operator = _operator(stages[index])
+        following = _operator(stages[index + 1])
+
+        if operator == LIMIT and following == LIMIT:
+            stages[index] = {LIMIT: min(stages[index][LIMIT], stages[index + 1][LIMIT])}
+            del stages[index + 1]
+            return True
+
+        if operator == SKIP and following == SKIP:
+            stages[index] = {SKIP: stages[index][SKIP] + stages[index + 1][SKIP]}
+            del stages[index + 1]
+            return True
+
+        if operator in _ONE_TO_ONE and following == LIMIT:
+            # $limit commutes with one-to-one stages, moving it up lets the server run top-k sort
+            stages[index], stages[index + 1] = stages[index + 1], stages[index]
+            return True
+    return False
+
+
+def _prune_projections(stages: List[Dict]) -> bool:
+    changed = False
+
+    for index, stage in enumerate(stages):
+        if _operator(stage) != PROJECT or _is_exclusion(stage[PROJECT]):
+            continue
+
+        used = set()
+        try:
+            for later in stages[index + 1:]:
+                used.update(_stage_refs(later))
+                if _operator(later) in _BARRIERS or (_operator(later) == PROJECT and not _is_exclusion(later[PROJECT])):
+                    break
+            else:
+                continue
+        except _Unknown:
+            continue
+
+        projection = stage[PROJECT]
+        kept = {key: value for key, value in projection.items() if key == '_id' or _root(key) in used}
+
+        if len(kept) != len(projection):
+            if not any(key != '_id' for key in kept):
+                kept['_id'] = 1
+            stages[index] = {PROJECT: kept}
+            changed = True
+
+    return changed
+
+
+_RULES = (_merge_adjacent_matches, _push_matches_up, _merge_sort_limit, _prune_projections)
+
+
+def optimize_pipeline(stages: List[Dict]) -> List[Dict]:
+    """
+    Returns equivalent pipeline with `$match` stages merged and moved as early as possible,
+    `$limit` placed next to preceding `$sort` and `$project` fields unused by later stages removed.
+    Input is not modified.
+    """
+    stages = deepcopy(stages)
+
+    for _ in range(_MAX_PASSES):
+        if not any([rule(stages) for rule in _RULES]):
+            break
+
+    return stages
@@ -1,3 +1,23 @@
+import asyncio
+from collections import OrderedDict
+from time import monotonic
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Optional,
+    Tuple,
+)
+
+from maio.lib.metrics import (
+    MetricsRegistry,
+    metrics,
+)
+
+
 # noinspection PyPep8Naming
 class cached_property:
     __slots__ = ('_constructor', '_name')
@@ -12,3 +32,127 @@ class cached_property:
             instance = self._constructor(container)
             container.__dict__[self._name] = instance
         return instance
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Size bounded LRU cache with per entry expiration.
+    Expired entries are dropped lazily on access, least recently used ones when the cache is full.
+    """
+    __slots__ = ('ttl', 'max_size', '_data')
+
+    def __init__(self, ttl: float, max_size: int = 1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+
+        expires, value = entry
+        if expires < monotonic():
+            del self._data[key]
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        data = self._data
+        data[key] = (monotonic() + (self.ttl if ttl is None else ttl), value)
+        data.move_to_end(key)
+
+        if len(data) > self.max_size:
+            data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> bool:
+        return self._data.pop(key, None) is not None
+
+    def invalidate_where(self, predicate: Callable[[Any], bool]) -> int:
+        """
+        Drops entries whose value matches `predicate`, walks whole cache
+        """
+        keys = [key for key, (_, value) in self._data.items() if predicate(value)]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def clear(self):
+        self._data.clear()
+
+
+class ReadThroughCache:
+    """
+    Async read-through cache on top of `TTLCache`.
+
+    Only one load per key runs at a time, concurrent readers wait for its result.
+    Missing values (`None`) are cached for `negative_ttl` seconds, `0` disables negative caching.
+    Invalidation drops the entry and makes loads already in flight skip storing their result.
+    """
+    __slots__ = ('name', 'cache', 'negative_ttl', 'registry', '_inflight', '_version')
+
+    def __init__(self, name: str, ttl: float, max_size: int = 1024, negative_ttl: float = 5, registry: MetricsRegistry = metrics):
+        self.name = name
+        self.cache = TTLCache(ttl, max_size)
+        self.negative_ttl = negative_ttl
+        self.registry = registry
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._version = 0
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = self.cache.get(key, _MISSING)
+        if value is not _MISSING:
+            self.registry.counter('cache_hits', cache=self.name).inc()
+            return value
+
+        self.registry.counter('cache_misses', cache=self.name).inc()
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader, self._version))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None) if self._inflight.get(key) is task else None)
+
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], version: int) -> Any:
+        value = await loader()
+
+        if version == self._version:
+            if value is not None:
+                self.cache.set(key, value)
+            elif self.negative_ttl:
+                self.cache.set(key, None, self.negative_ttl)
+
+        return value
+
+    def invalidate(self, key: Hashable):
+        self._version += 1
+        self._inflight.pop(key, None)
+        self.cache.invalidate(key)
+
+    def invalidate_many(self, keys: Iterable[Hashable]):
+        self._version += 1
+        for key in keys:
+            self._inflight.pop(key, None)
+            self.cache.invalidate(key)
+
+    def invalidate_where(self, predicate: Callable[[Any], bool]) -> int:
+        self._version += 1
+        return self.cache.invalidate_where(predicate)
+
+    def clear(self):
+        self._version += 1
+        self._inflight.clear()
+        self.cache.clear()
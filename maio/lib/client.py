@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import threading
+from time import perf_counter
+from typing import (
+    Dict,
+    List,
+)
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from maio.lib.configs.mongo import MongoConfig
+from maio.lib.metrics import (
+    MetricsRegistry,
+    metrics,
+)
+from maio.lib.monitoring import event_listeners
+
+logger = logging.getLogger('mongo')
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """
+    Publishes connection pool checkout wait time, checkouts and pool occupancy.
+    Checkout start and end are paired by thread, pymongo runs both on the thread doing the operation.
+    """
+    __slots__ = ('registry', '_waiting')
+
+    def __init__(self, registry: MetricsRegistry = metrics):
+        self.registry = registry
+        self._waiting: Dict[int, float] = {}
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.registry.counter('mongo_pool_cleared', address=str(event.address)).inc()
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.registry.gauge('mongo_pool_connections', address=str(event.address)).inc()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.registry.gauge('mongo_pool_connections', address=str(event.address)).dec()
+
+    def connection_check_out_started(self, event):
+        self._waiting[threading.get_ident()] = perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self._waiting.pop(threading.get_ident(), None)
+        self.registry.counter('mongo_pool_checkout_failed', address=str(event.address), reason=str(event.reason)).inc()
+
+    def connection_checked_out(self, event):
+        address = str(event.address)
+        started = self._waiting.pop(threading.get_ident(), None)
+
+        if started is not None:
+            self.registry.histogram('mongo_pool_wait_ms', address=address).observe((perf_counter() - started) * 1000)
+        self.registry.counter('mongo_pool_checkouts', address=address).inc()
+        self.registry.gauge('mongo_pool_in_use', address=address).inc()
+
+    def connection_checked_in(self, event):
+        self.registry.gauge('mongo_pool_in_use', address=str(event.address)).dec()
+
+
+class MongoClientFactory:
+    """
+    Creates Motor client for single worker process.
+
+    With `connection_budget` in config the pool size is the budget split between `workers`,
+    capped by `max_conn`; `connect()` opens `min_conn` connections before the worker starts serving.
+    """
+    __slots__ = ('config', 'workers', 'registry')
+
+    def __init__(self, config: MongoConfig, workers: int = 1, registry: MetricsRegistry = metrics):
+        self.config = config
+        self.workers = max(1, workers)
+        self.registry = registry
+
+    def pool_size(self) -> int:
+        if self.config.connection_budget:
+            return max(1, min(self.config.max_conn, self.config.connection_budget // self.workers))
+        return self.config.max_conn
+
+    def min_pool_size(self) -> int:
+        return min(self.config.min_conn, self.pool_size())
+
+    def create(self, **kwargs) -> AsyncIOMotorClient:
+        listeners = [*event_listeners(self.config, self.registry), PoolMetricsListener(self.registry)]
+
+        return AsyncIOMotorClient(self.config.uri,
+                                  maxPoolSize=self.pool_size(),
+                                  minPoolSize=self.min_pool_size(),
+                                  uuidRepresentation=self.config.uuid,
+                                  event_listeners=listeners,
+                                  **kwargs)
+
+    def pool_connections(self, address) -> int:
+        return self.registry.gauge('mongo_pool_connections', address=str(address)).value
+
+    async def warmup(self, client: AsyncIOMotorClient, connections: int = None, timeout: float = 15.0) -> int:
+        """
+        Pings until pool of every known server (replica set members, all mongos routers) holds `connections`
+        (by default `min_conn`) open connections, as counted by `PoolMetricsListener`. Pool opens at most
+        `maxConnecting` connections at once and fills up to `minPoolSize` in background, so this may take
+        a few heartbeats; gives up after `timeout` seconds. Returns connections opened on all servers.
+        """
+        connections = self.min_pool_size() if connections is None else min(connections, self.pool_size())
+        if connections <= 0:
+            return 0
+
+        started = perf_counter()
+        await client.admin.command('ping')
+        # `client.address` is ambiguous with more than one mongos
+        addresses = client.nodes
+
+        def opened() -> List[int]:
+            return [self.pool_connections(address) for address in addresses]
+
+        while min(opened(), default=0) < connections and perf_counter() - started < timeout:
+            await asyncio.gather(*[client.admin.command('ping') for _ in range(connections)])
+            await asyncio.sleep(0.05)
+            addresses = client.nodes
+
+        pools = opened()
+        if min(pools, default=0) < connections:
+            logger.warning(f"Mongo pool warmup timed out with {pools} of {connections} connections per server")
+        else:
+            logger.info(f"Mongo pools of {len(pools)} servers warmed up with {connections} connections [{(perf_counter() - started) * 1000} ms]")
+
+        return sum(pools)
+
+    async def connect(self, **kwargs) -> AsyncIOMotorClient:
+        client = self.create(**kwargs)
+        await self.warmup(client)
+        return client
@@ -1,14 +1,39 @@
 import multiprocessing
 from dataclasses import dataclass
+from typing import Optional
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, init=False)
 class MongoConfig:
-    __slots__ = ('uuid', 'max_conn', 'uri')
+    __slots__ = ('uuid', 'max_conn', 'uri', 'monitoring', 'slow_query_ms', 'min_conn', 'connection_budget')
 
     uri: str
     max_conn: int
     uuid: str
+    monitoring: bool
+    slow_query_ms: int
+    min_conn: int
+    connection_budget: Optional[int]
+
+    def __init__(self,
+                 uri: str,
+                 max_conn: int,
+                 uuid: str,
+                 monitoring: Optional[bool] = None,
+                 slow_query_ms: Optional[int] = None,
+                 min_conn: Optional[int] = None,
+                 connection_budget: Optional[int] = None):
+        # frozen dataclass with slots cannot have field defaults, omitted options fall back to mapper defaults
+        default = MongoJsonMapper.DEFAULTS
+        set_field = object.__setattr__
+
+        set_field(self, 'uri', uri)
+        set_field(self, 'max_conn', max_conn)
+        set_field(self, 'uuid', uuid)
+        set_field(self, 'monitoring', default.MONITORING if monitoring is None else monitoring)
+        set_field(self, 'slow_query_ms', default.SLOW_QUERY_MS if slow_query_ms is None else slow_query_ms)
+        set_field(self, 'min_conn', default.MIN_CONNECTIONS if min_conn is None else min_conn)
+        set_field(self, 'connection_budget', connection_budget)
 
     @classmethod
     def from_json(cls, json_config: dict):
@@ -24,11 +49,18 @@ class MongoJsonMapper:
         CONNECTION_URI = "connectionUri"
         POOL_SIZE = "maxPoolSize"
         UUID = "uuid"
+        MONITORING = "monitoring"
+        SLOW_QUERY_MS = "slowQueryMs"
+        MIN_POOL_SIZE = "minPoolSize"
+        CONNECTION_BUDGET = "connectionBudget"
 
     class DEFAULTS:
         __slots__ = ()
         CONNECTIONS = 100
         UUID = "standard"
+        MONITORING = False
+        SLOW_QUERY_MS = 100
+        MIN_CONNECTIONS = 0
 
     @classmethod
     def from_json(cls, json_data: dict) -> MongoConfig:
@@ -41,14 +73,19 @@ class MongoJsonMapper:
         uri = json_data[_.CONNECTION_URI]
         max_conn = int(json_data.get(_.POOL_SIZE)) if _.POOL_SIZE in json_data else multiprocessing.cpu_count() * default.CONNECTIONS
         uuid = json_data.get(_.UUID, default.UUID)
+        monitoring = bool(json_data.get(_.MONITORING, default.MONITORING))
+        slow_query_ms = int(json_data.get(_.SLOW_QUERY_MS, default.SLOW_QUERY_MS))
+        min_conn = int(json_data.get(_.MIN_POOL_SIZE, default.MIN_CONNECTIONS))
+        connection_budget = int(json_data[_.CONNECTION_BUDGET]) if _.CONNECTION_BUDGET in json_data else None
 
-        return MongoConfig(uri, max_conn, uuid)
+        return MongoConfig(uri, max_conn, uuid, monitoring, slow_query_ms, min_conn, connection_budget)
 
 
 class MongoDictMapper:
     class Dict:
         CONNECTION_URI = "connectionUri"
         POOL_SIZE = "maxPoolSize"
+        MIN_POOL_SIZE = "minPoolSize"
         UUID = "uuidRepresentation"
 
     @classmethod
@@ -57,5 +94,6 @@ class MongoDictMapper:
         return {
             _.CONNECTION_URI: mongo_config.uri,
             _.POOL_SIZE: mongo_config.max_conn,
+            _.MIN_POOL_SIZE: mongo_config.min_conn,
             _.UUID: mongo_config.uuid
         }
@@ -0,0 +1,106 @@
+from datetime import datetime
+from typing import (
+    Any,
+    Dict,
+    Hashable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from maio.lib.cached import TTLCache
+from maio.lib.request.pagination import Pagination
+
+
+class PageCount(NamedTuple):
+    total: int
+    exact: bool
+    has_more: bool
+
+    class Fields:
+        __slots__ = ()
+        TOTAL = 'total'
+        EXACT = 'exact'
+        HAS_MORE = 'hasMore'
+
+    def to_dict(self) -> Dict[str, Any]:
+        _ = self.Fields
+
+        return {
+            _.TOTAL: self.total,
+            _.EXACT: self.exact,
+            _.HAS_MORE: self.has_more
+        }
+
+
+def normalize_filter(query: Any) -> Hashable:
+    """
+    Builds hashable representation of Mongo filter that does not depend on key order
+    """
+    if isinstance(query, dict):
+        return tuple(sorted((key, normalize_filter(value)) for key, value in query.items()))
+    if isinstance(query, (list, tuple)):
+        return '[]', tuple(normalize_filter(value) for value in query)
+    if isinstance(query, (set, frozenset)):
+        return '{}', tuple(sorted(repr(value) for value in query))
+    if isinstance(query, (str, int, float, bool, datetime)) or query is None:
+        return query.__class__.__name__, query
+    return query.__class__.__name__, repr(query)
+
+
+class CountService:
+    """
+    Provides totals for paginated lists without counting on every request.
+
+    Filtered counts are cached per normalized filter for `ttl` seconds, unfiltered lists use collection metadata.
+    Totals that can be derived from the fetched page are returned without asking Mongo at all.
+    """
+    __slots__ = ('cache',)
+
+    def __init__(self, ttl: float = 30, max_size: int = 1024):
+        self.cache = TTLCache(ttl, max_size)
+
+    async def count(self,
+                    collection: AsyncIOMotorCollection,
+                    query: Optional[Dict],
+                    pagination: Pagination,
+                    fetched: int) -> PageCount:
+        if fetched < pagination.limit and (fetched or not pagination.offset):
+            return PageCount(pagination.offset + fetched, True, False)
+
+        if not query:
+            total = await collection.estimated_document_count()
+            exact = False
+        else:
+            key = (collection.full_name, normalize_filter(query))
+            total = self.cache.get(key)
+            exact = total is None
+
+            if exact:
+                total = await collection.count_documents(query)
+                self.cache.set(key, total)
+
+        return PageCount(total, exact, total > pagination.offset + fetched)
+
+    @staticmethod
+    def has_more(pagination: Pagination, rows: List[Any]) -> Tuple[List[Any], PageCount]:
+        """
+        Resolves page fetched with `Pagination.look_ahead()` - extra row only tells that next page exists
+        """
+        has_more = len(rows) > pagination.limit
+        if has_more:
+            rows = rows[:pagination.limit]
+
+        # empty page past the end does not tell where the list ends
+        exact = not has_more and bool(rows or not pagination.offset)
+
+        return rows, PageCount(pagination.offset + len(rows), exact, has_more)
+
+    def invalidate(self, collection: AsyncIOMotorCollection, query: Dict) -> bool:
+        return self.cache.invalidate((collection.full_name, normalize_filter(query)))
+
+    def clear(self):
+        self.cache.clear()
@@ -29,6 +29,7 @@ INVALID_OBJECT = Error("INVALID_KIND", {"expected": "object"})
 INVALID_ARRAY = Error("INVALID_KIND", {"expected": "array"})
 INVALID_STRING = Error("INVALID_KIND", {"expected": "string"})
 INVALID_UUID = Error("INVALID_KIND", {"expected": "UUID"})
+INVALID_OBJECT_ID = Error("INVALID_KIND", {"expected": "objectId"})
 INVALID_DATE = Error("INVALID_KIND", {"expected": "date"})
 INVALID_DATETIME = Error("INVALID_KIND", {"expected": "datetime"})
 INVALID_BOOL = Error("INVALID_KIND", {"expected": "bool"})
@@ -27,8 +27,15 @@ from aiohttp.web_urldispatcher import (
 from yarl import URL
 
 from maio.lib.configs.app import DomainConfig
-from maio.lib.response import ErrorResponse
-from maio.lib.response import UnauthorizedResponse
+from maio.lib.metrics import (
+    MetricsRegistry,
+    metrics,
+)
+from maio.lib.response import (
+    ErrorResponse,
+    OkResponse,
+    UnauthorizedResponse,
+)
 from maio.lib.session.service import SessionException
 
 _MSEC_NS = 1_000_000
@@ -38,7 +45,7 @@ def to_const(value: str) -> str:
     return value.upper().replace(" ", "_")
 
 
-def error_middleware(logger):
+def error_middleware(logger, registry: MetricsRegistry = metrics):
     @web.middleware
     async def _middleware(request: Request, handler):
         ts_start = time_ns()
@@ -72,7 +79,14 @@ def error_middleware(logger):
         finally:
             if response is not None:
                 ts_end = time_ns()
-                logger.info(f"[{request.method}] {request.raw_path} -> {response.status} [{(ts_end - ts_start) / _MSEC_NS} ms]")
+                duration = (ts_end - ts_start) / _MSEC_NS
+                logger.info(f"[{request.method}] {request.raw_path} -> {response.status} [{duration} ms]")
+
+                resource = request.match_info.route.resource
+                registry.histogram('http_request_ms',
+                                   method=request.method,
+                                   resource=resource.canonical if resource else None,
+                                   status=response.status).observe(duration)
 
     return _middleware
 
@@ -104,6 +118,17 @@ class Handler:
         return Response(headers={'Access-Control-Allow-Methods': ",".join(self.__methods__.keys())})
 
 
+class MetricsHandler(Handler):
+    __slots__ = ('registry',)
+
+    def __init__(self, registry: MetricsRegistry = metrics):
+        super().__init__()
+        self.registry = registry
+
+    async def get(self, request: Request, **kwargs):
+        return OkResponse({'metrics': self.registry.collect()})
+
+
 class RegexResource(Resource):
     def __init__(self, path: str, *, name: Optional[str] = None) -> None:
         super().__init__(name=name)
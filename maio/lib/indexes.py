@@ -0,0 +1,211 @@
+import logging
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from pymongo import IndexModel
+from pymongo.database import Database
+
+logger = logging.getLogger('indexes')
+
+_EQUALITY_OPERATORS = {'$eq', '$in', '$all'}
+
+
+class Index:
+    __slots__ = ('keys', 'name', 'unique', 'sparse', 'expire_after', 'partial')
+
+    def __init__(self,
+                 keys: Union[str, List[Tuple[str, int]]],
+                 name: Optional[str] = None,
+                 unique: bool = False,
+                 sparse: bool = False,
+                 expire_after: Optional[int] = None,
+                 partial: Optional[Dict] = None):
+        self.keys = [(keys, 1)] if isinstance(keys, str) else list(keys)
+        self.name = name or '_'.join(f'{field}_{direction}' for field, direction in self.keys)
+        self.unique = unique
+        self.sparse = sparse
+        self.expire_after = expire_after
+        self.partial = partial
+
+    def to_model(self) -> IndexModel:
+        options = {'name': self.name}
+        if self.unique:
+            options['unique'] = True
+        if self.sparse:
+            options['sparse'] = True
+        if self.expire_after is not None:
+            options['expireAfterSeconds'] = self.expire_after
+        if self.partial:
+            options['partialFilterExpression'] = self.partial
+
+        return IndexModel(self.keys, **options)
+
+    def __repr__(self):
+        return f'Index({self.name})'
+
+
+def _combine(left: List[Tuple[frozenset, frozenset]], right: List[Tuple[frozenset, frozenset]]) -> List[Tuple[frozenset, frozenset]]:
+    return [(left_equality | right_equality, left_ranges | right_ranges)
+            for left_equality, left_ranges in left
+            for right_equality, right_ranges in right]
+
+
+def _query_branches(query: Dict) -> List[Tuple[frozenset, frozenset]]:
+    """
+    Splits query into (equality fields, range fields) per `$or` branch
+    """
+    branches = [(frozenset(), frozenset())]
+
+    for key, value in query.items():
+        if key == '$and':
+            for condition in value:
+                branches = _combine(branches, _query_branches(condition))
+        elif key == '$or':
+            branches = _combine(branches, [branch for condition in value for branch in _query_branches(condition)])
+        elif not key.startswith('$'):
+            if isinstance(value, dict) and any(operator.startswith('$') for operator in value):
+                is_equality = _EQUALITY_OPERATORS.issuperset(value)
+            else:
+                is_equality = True
+
+            field = frozenset((key,))
+            branches = [(equality | field, ranges) if is_equality else (equality, ranges | field) for equality, ranges in branches]
+
+    return branches
+
+
+_ID_INDEX = Index('_id')
+
+
+class QueryShape(NamedTuple):
+    collection: str
+    equality: Tuple[str, ...]
+    ranges: Tuple[str, ...]
+    sort: Tuple[Tuple[str, int], ...]
+
+    @classmethod
+    def from_query(cls, collection: str, query: Optional[Dict], sort: Optional[List[Tuple[str, int]]] = None) -> List['QueryShape']:
+        """
+        Every `$or` branch needs its own index, so query can produce more than one shape
+        """
+        sort = tuple(sort or ())
+        branches = _query_branches(query or {})
+
+        return [cls(collection, tuple(sorted(equality)), tuple(sorted(ranges - equality)), sort) for equality, ranges in set(branches)]
+
+    def covered_by(self, index: Index) -> bool:
+        fields = [field for field, _ in index.keys]
+        directions = [direction for _, direction in index.keys]
+        position = len(self.equality)
+
+        if set(fields[:position]) != set(self.equality) or len(fields) < position:
+            return False
+
+        if self.sort:
+            sort_fields = [field for field, _ in self.sort]
+            if fields[position:position + len(sort_fields)] != sort_fields:
+                return False
+
+            sort_directions = [direction for _, direction in self.sort]
+            index_directions = directions[position:position + len(sort_fields)]
+            if index_directions != sort_directions and index_directions != [-direction for direction in sort_directions]:
+                return False
+
+            position += len(sort_fields)
+
+        return set(self.ranges).issubset(fields[position:])
+
+    def is_trivial(self) -> bool:
+        return (not self.equality and not self.ranges and not self.sort) or '_id' in self.equality
+
+
+class IndexRegistry:
+    __slots__ = ('_indexes',)
+
+    def __init__(self):
+        self._indexes: Dict[str, Dict[str, Index]] = {}
+
+    def register(self, collection: str, *indexes: Index):
+        declared = self._indexes.setdefault(collection, {})
+        for index in indexes:
+            declared[index.name] = index
+
+    def unregister(self, collection: str, *names: str):
+        declared = self._indexes.get(collection, {})
+        for name in names:
+            declared.pop(name, None)
+
+    def get(self, collection: str) -> List[Index]:
+        return list(self._indexes.get(collection, {}).values())
+
+    def collections(self) -> List[str]:
+        return list(self._indexes.keys())
+
+    async def ensure(self, database: Database, collections: Optional[Iterable[str]] = None) -> Dict[str, List[str]]:
+        created = {}
+
+        for collection in collections or self.collections():
+            indexes = self.get(collection)
+            if indexes:
+                created[collection] = await database.get_collection(collection).create_indexes([index.to_model() for index in indexes])
+                logger.info(f"Ensured indexes {created[collection]} on {collection}")
+
+        return created
+
+
+class IndexAdvisor:
+    """
+    Collects query shapes seen at runtime and reports the ones no declared index covers.
+    Disabled by default, recording costs a dict walk per query.
+    """
+    __slots__ = ('registry', 'enabled', 'shapes')
+
+    def __init__(self, registry: IndexRegistry, enabled: bool = False):
+        self.registry = registry
+        self.enabled = enabled
+        self.shapes: Dict[QueryShape, int] = {}
+
+    def record(self, collection: str, query: Optional[Dict], sort: Optional[List[Tuple[str, int]]] = None):
+        if not self.enabled:
+            return
+
+        for shape in QueryShape.from_query(collection, query, sort):
+            if not shape.is_trivial():
+                self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def uncovered(self) -> List[Tuple[QueryShape, int]]:
+        result = []
+        for shape, count in self.shapes.items():
+            if not any(shape.covered_by(index) for index in (_ID_INDEX, *self.registry.get(shape.collection))):
+                result.append((shape, count))
+
+        return sorted(result, key=lambda element: element[1], reverse=True)
+
+    def report(self) -> List[Dict[str, Any]]:
+        report = []
+        for shape, count in self.uncovered():
+            logger.warning(f"Query shape without index on {shape.collection}: equality={shape.equality} sort={shape.sort} range={shape.ranges} seen {count} times")
+            report.append({
+                'collection': shape.collection,
+                'equality': list(shape.equality),
+                'sort': [list(element) for element in shape.sort],
+                'range': list(shape.ranges),
+                'count': count
+            })
+
+        return report
+
+    def clear(self):
+        self.shapes.clear()
+
+
+indexes = IndexRegistry()
+advisor = IndexAdvisor(indexes)
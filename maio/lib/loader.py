@@ -0,0 +1,118 @@
+import asyncio
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+)
+
+from aiohttp.web_request import Request
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from maio.lib.repository import Mongo
+
+
+class BatchLoader:
+    """
+    Per request loader that turns concurrent lookups by id into single `$in` query.
+
+    All `load()` calls made in the same event loop tick (e.g. coroutines started with `asyncio.gather`)
+    are sent as one `find`. Every id is fetched at most once per loader, later loads get the remembered result.
+    """
+    __slots__ = ('collection', 'mapper', 'key', 'projection', 'max_batch', '_futures', '_queue', '_scheduled')
+
+    def __init__(self,
+                 collection: AsyncIOMotorCollection,
+                 mapper: Optional[Callable[[Dict], Any]] = None,
+                 key: str = '_id',
+                 projection: Optional[Dict[str, int]] = None,
+                 max_batch: int = 1000):
+        self.collection = collection
+        self.mapper = mapper
+        self.key = key
+        self.projection = projection
+        self.max_batch = max_batch
+        self._futures: Dict[Any, asyncio.Future] = {}
+        self._queue: List[Any] = []
+        self._scheduled = False
+
+    async def load(self, object_id: Any) -> Optional[Any]:
+        future = self._futures.get(object_id)
+
+        if future is None:
+            loop = asyncio.get_event_loop()
+            future = self._futures[object_id] = loop.create_future()
+            self._queue.append(object_id)
+
+            if not self._scheduled:
+                self._scheduled = True
+                loop.call_soon(self._dispatch)
+
+        return await asyncio.shield(future)
+
+    async def load_many(self, object_ids: Iterable[Any]) -> List[Optional[Any]]:
+        return await asyncio.gather(*[self.load(object_id) for object_id in object_ids])
+
+    def prime(self, object_id: Any, value: Any):
+        future = self._futures.get(object_id)
+        if future is None or future.done():
+            future = self._futures[object_id] = asyncio.get_event_loop().create_future()
+            future.set_result(value)
+
+    def clear(self, object_id: Optional[Any] = None):
+        if object_id is None:
+            self._futures = {future_id: future for future_id, future in self._futures.items() if not future.done()}
+        else:
+            future = self._futures.get(object_id)
+            if future is not None and future.done():
+                del self._futures[object_id]
+
+    def _dispatch(self):
+        self._scheduled = False
+        queue, self._queue = self._queue, []
+
+        for index in range(0, len(queue), self.max_batch):
+            asyncio.ensure_future(self._fetch(queue[index:index + self.max_batch]))
+
+    async def _fetch(self, object_ids: List[Any]):
+        key = self.key
+        mapper = self.mapper
+        futures = self._futures
+
+        try:
+            found = {}
+            async for document in self.collection.find({key: Mongo.match_in(object_ids)}, self.projection):
+                found[document[key]] = mapper(document) if mapper else document
+
+        except Exception as exception:
+            for object_id in object_ids:
+                future = futures.pop(object_id, None)
+                if future is not None and not future.done():
+                    future.set_exception(exception)
+            return
+
+        for object_id in object_ids:
+            future = futures.get(object_id)
+            if future is not None and not future.done():
+                future.set_result(found.get(object_id))
+
+
+_LOADERS_KEY = 'maio.loaders'
+
+
+def request_loader(request: Request, collection: AsyncIOMotorCollection, mapper: Optional[Callable[[Dict], Any]] = None) -> BatchLoader:
+    """
+    Returns loader for collection bound to request lifetime, created on first use
+    """
+    loaders = request.get(_LOADERS_KEY)
+    if loaders is None:
+        loaders = request[_LOADERS_KEY] = {}
+
+    key = (collection.name, mapper)
+    loader = loaders.get(key)
+    if loader is None:
+        loader = loaders[key] = BatchLoader(collection, mapper)
+
+    return loader
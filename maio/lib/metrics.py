@@ -0,0 +1,131 @@
+import threading
+from bisect import bisect_left
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+DEFAULT_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Counter:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'value': self.value}
+
+
+class Gauge:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'value': self.value}
+
+
+class Histogram:
+    """
+    Histogram with fixed bucket upper bounds, values above the highest bound land in the last bucket
+    """
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'max', '_lock')
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'count': self.count,
+                'sum': self.sum,
+                'max': self.max,
+                'buckets': dict(zip([*self.buckets, 'inf'], self.counts))
+            }
+
+
+class MetricsRegistry:
+    """
+    Process local registry of named metrics, labels distinguish series of the same metric.
+    Safe to use from other threads, e.g. pymongo listeners running in Motor executor.
+    """
+    __slots__ = ('_metrics', '_lock')
+
+    def __init__(self):
+        self._metrics: Dict[str, Dict[Tuple, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, labels: Dict[str, Any], factory):
+        key = tuple(sorted(labels.items()))
+
+        metric = self._metrics.get(name, {}).get(key)
+        if metric is None:
+            with self._lock:
+                series = self._metrics.setdefault(name, {})
+                metric = series.get(key)
+                if metric is None:
+                    metric = series[key] = factory()
+        return metric
+
+    def counter(self, name: str, **labels) -> Counter:
+        return self._get(name, labels, Counter)
+
+    def gauge(self, name: str, **labels) -> Gauge:
+        return self._get(name, labels, Gauge)
+
+    def histogram(self, name: str, buckets: Optional[Sequence[float]] = None, **labels) -> Histogram:
+        return self._get(name, labels, lambda: Histogram(buckets or DEFAULT_BUCKETS))
+
+    def collect(self) -> Dict[str, List[Dict[str, Any]]]:
+        with self._lock:
+            snapshot = [(name, list(series.items())) for name, series in self._metrics.items()]
+
+        return {
+            name: [{'labels': dict(key), **metric.to_dict()} for key, metric in series]
+            for name, series in snapshot
+        }
+
+    def clear(self):
+        with self._lock:
+            self._metrics.clear()
+
+
+metrics = MetricsRegistry()
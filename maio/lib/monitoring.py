@@ -0,0 +1,141 @@
+import logging
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from pymongo import monitoring
+
+from maio.lib.configs.mongo import MongoConfig
+from maio.lib.metrics import (
+    MetricsRegistry,
+    metrics,
+)
+
+logger = logging.getLogger('mongo')
+
+PLACEHOLDER = '?'
+
+_QUERY_FIELDS = {
+    'find': 'filter',
+    'count': 'query',
+    'distinct': 'query',
+    'findAndModify': 'query',
+    'aggregate': 'pipeline',
+}
+_WRITE_FIELDS = {
+    'update': ('updates', 'q'),
+    'delete': ('deletes', 'q'),
+}
+_TRACKED = {*_QUERY_FIELDS, *_WRITE_FIELDS, 'insert', 'getMore'}
+_READS = {'find', 'getMore', 'aggregate', 'distinct', 'findAndModify'}
+
+
+def query_shape(value: Any) -> Any:
+    """
+    Replaces values in query with placeholders, keeps field names and operators
+    """
+    if isinstance(value, dict):
+        return {key: query_shape(element) for key, element in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(element, dict) for element in value):
+            return [query_shape(element) for element in value]
+        return [PLACEHOLDER]
+    return PLACEHOLDER
+
+
+def _returned(command_name: str, reply: Dict) -> int:
+    cursor = reply.get('cursor')
+    if cursor:
+        return len(cursor.get('firstBatch', cursor.get('nextBatch', ())))
+    if command_name == 'findAndModify':
+        return 1 if reply.get('value') else 0
+    if command_name == 'distinct':
+        return len(reply.get('values', ()))
+    return 0
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    Records latency per collection and operation and documents returned by reads into metrics registry,
+    logs normalized shape of commands slower than `slow_query_ms`
+    """
+    __slots__ = ('slow_query_ms', 'registry', '_started')
+
+    def __init__(self, slow_query_ms: int = 100, registry: MetricsRegistry = metrics):
+        self.slow_query_ms = slow_query_ms
+        self.registry = registry
+        self._started: Dict[Tuple[Any, int], Tuple[str, Optional[Any]]] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        command_name = event.command_name
+        if command_name not in _TRACKED:
+            return
+
+        command = event.command
+        if command_name == 'getMore':
+            collection = command.get('collection')
+            shape = None
+        else:
+            collection = command.get(command_name)
+            shape = self._shape(command_name, command)
+
+        self._started[(event.connection_id, event.request_id)] = (collection, shape)
+
+    def _shape(self, command_name: str, command: Dict) -> Optional[Any]:
+        field = _QUERY_FIELDS.get(command_name)
+        if field:
+            shape = {field: query_shape(command.get(field, {}))}
+            if command.get('sort'):
+                shape['sort'] = dict(command['sort'])
+            return shape
+
+        write = _WRITE_FIELDS.get(command_name)
+        if write:
+            statements, field = write
+            statements = command.get(statements) or [{}]
+            return {field: query_shape(statements[0].get(field, {})), 'count': len(statements)}
+
+        return None
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+
+        collection, shape = started
+        duration = event.duration_micros / 1000
+        operation = event.command_name
+
+        self.registry.histogram('mongo_command_ms', collection=collection, operation=operation).observe(duration)
+        if operation in _READS:
+            self.registry.counter('mongo_documents_returned', collection=collection, operation=operation).inc(_returned(operation, event.reply))
+
+        if duration >= self.slow_query_ms:
+            self.registry.counter('mongo_slow_commands', collection=collection, operation=operation).inc()
+            logger.warning(f"Slow {operation} on {collection} [{duration} ms]: {shape}")
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+
+        collection, shape = started
+        operation = event.command_name
+
+        self.registry.histogram('mongo_command_ms', collection=collection, operation=operation).observe(event.duration_micros / 1000)
+        self.registry.counter('mongo_command_failed', collection=collection, operation=operation).inc()
+        logger.warning(f"Failed {operation} on {collection}: {shape} {event.failure}")
+
+
+def event_listeners(config: MongoConfig, registry: MetricsRegistry = metrics) -> List[monitoring.CommandListener]:
+    """
+    Listeners to pass as `event_listeners` to Motor client, empty unless monitoring is on in config
+    """
+    if not config.monitoring:
+        return []
+
+    return [MongoCommandListener(config.slow_query_ms, registry)]
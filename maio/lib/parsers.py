@@ -25,6 +25,7 @@ from uuid import (
 )
 
 from bson import ObjectId
+from bson.errors import InvalidId
 
 PHONE_RE = re.compile(r'^\+?([0-9 ])+$')
 PHONE_9_RE = re.compile(r'^\+?([0-9 ]){9}$')
@@ -53,7 +54,7 @@ def parse_object_id(object_id: str, default: ObjectId = None) -> Optional[Object
     try:
         if object_id:
             return ObjectId(object_id.decode() if isinstance(object_id, bytes) else object_id)
-    except (ValueError, TypeError, AttributeError):
+    except (InvalidId, ValueError, TypeError, AttributeError):
         pass
     return default
 
@@ -1,11 +1,15 @@
+import logging
 import re
 from collections import namedtuple
 from datetime import datetime
 from typing import (
     Any,
+    Callable,
     Dict,
     Iterable,
+    Iterator,
     List,
+    Mapping,
     Optional,
     Tuple,
     Type,
@@ -13,19 +17,42 @@ from typing import (
 )
 
 import bson
+from bson import (
+    ObjectId,
+    SON,
+)
+from bson.raw_bson import RawBSONDocument
+from pymongo import (
+    InsertOne,
+    UpdateOne,
+)
 from pymongo.collation import (
     Collation,
     CollationStrength
 )
-from pymongo.errors import DuplicateKeyError
+from pymongo.database import Database
+from pymongo.errors import (
+    BulkWriteError,
+    DuplicateKeyError,
+)
 
+from maio.lib.aggregation import optimize_pipeline
+from maio.lib.cached import ReadThroughCache
+from maio.lib.indexes import (
+    Index,
+    advisor,
+    indexes,
+)
 from maio.lib.request.pagination import (
     AscDirection,
     DescDirection,
     Direction,
+    Pagination,
     Sort
 )
 
+logger = logging.getLogger('repository')
+
 
 class RepositoryException(Exception):
     pass
@@ -89,7 +116,11 @@ class Mongo:
     __slots__ = ()
 
     class Pipeline:
-        __slots__ = ('_pipeline',)
+        """
+        Aggregation pipeline builder. With `optimize` on `get()` returns pipeline rewritten by `optimize_pipeline`,
+        with `debug` both versions are logged.
+        """
+        __slots__ = ('_pipeline', 'optimize', 'debug')
 
         class Methods:
             __slots__ = ()
@@ -97,9 +128,14 @@ class Mongo:
             PROJECT = '$project'
             GROUP = '$group'
             MATCH = '$match'
+            SORT = '$sort'
+            LIMIT = '$limit'
+            SKIP = '$skip'
 
-        def __init__(self):
+        def __init__(self, optimize: bool = False, debug: bool = False):
             self._pipeline = []
+            self.optimize = optimize
+            self.debug = debug
 
         def project(self, definition: Dict) -> 'Mongo.Pipeline':
             self._pipeline.append({self.Methods.PROJECT: definition})
@@ -113,8 +149,51 @@ class Mongo:
             self._pipeline.append({self.Methods.MATCH: definition})
             return self
 
-        def get(self):
-            return self._pipeline
+        def sort(self, definition: Union[Dict[str, int], List[Tuple[str, int]]]) -> 'Mongo.Pipeline':
+            self._pipeline.append({self.Methods.SORT: dict(definition)})
+            return self
+
+        def limit(self, limit: int) -> 'Mongo.Pipeline':
+            self._pipeline.append({self.Methods.LIMIT: limit})
+            return self
+
+        def skip(self, skip: int) -> 'Mongo.Pipeline':
+            self._pipeline.append({self.Methods.SKIP: skip})
+            return self
+
+        def stage(self, stage: Dict) -> 'Mongo.Pipeline':
+            self._pipeline.append(stage)
+            return self
+
+        def get(self) -> List[Dict]:
+            if not self.optimize:
+                return self._pipeline
+
+            optimized = optimize_pipeline(self._pipeline)
+
+            if self.debug:
+                logger.info(f"Pipeline {self._pipeline} rewritten to {optimized}")
+
+            return optimized
+
+        async def explain(self, database: Database, collection: str, verbosity: str = 'executionStats') -> Dict[str, Dict]:
+            """
+            Runs explain of original and optimized pipeline, for debugging only
+            """
+            results = {}
+
+            for name, pipeline in (('original', self._pipeline), ('optimized', optimize_pipeline(self._pipeline))):
+                command = SON([('explain', SON([('aggregate', collection), ('pipeline', pipeline), ('cursor', {})])),
+                               ('verbosity', verbosity)])
+                results[name] = {
+                    'pipeline': pipeline,
+                    'explain': await database.command(command)
+                }
+
+            if self.debug:
+                logger.info(f"Pipeline explain {results}")
+
+            return results
 
     @staticmethod
     def update_set(set_changes: Dict, update: Optional[Dict] = None) -> Dict:
@@ -124,6 +203,19 @@ class Mongo:
 
         return update
 
+    @staticmethod
+    def projection(fields: Optional[Iterable[str]], mapping: Optional[Dict[str, str]] = None, required: Iterable[str] = ()) -> Optional[Dict[str, int]]:
+        if not fields:
+            return None
+
+        if mapping:
+            fields = [mapping.get(field, field) for field in fields]
+
+        selected = dict.fromkeys([*fields, *required])
+        # selecting both parent and its child path is a path collision for Mongo, parent covers child
+        return {field: 1 for field in selected
+                if not any(field.startswith(f'{parent}.') for parent in selected)}
+
     @staticmethod
     def match_not_none():
         return {'$ne': None}
@@ -212,3 +304,249 @@ class Mongo:
 
 
 UpdateOperationResult = namedtuple('UpdateOperationResult', ['found', 'modified'])
+
+
+def raw_collection(collection):
+    """
+    Returns the same collection returning `RawBSONDocument`s - top level is decoded on first access, nested documents stay raw until read
+    """
+    codec_options = collection.codec_options.with_options(document_class=RawBSONDocument)
+    return collection.with_options(codec_options=codec_options)
+
+
+def document_mapper(factory: Callable[..., Any], fields: Dict[str, str]) -> Callable[[Mapping], Any]:
+    """
+    Builds mapper calling `factory(**{argument: document[field]})` for given (possibly dotted) fields only,
+    `mapper.projection` holds matching Mongo projection
+    """
+    items = tuple((argument, tuple(field.split('.'))) for argument, field in fields.items())
+
+    def read(document: Mapping, path: Tuple[str, ...]) -> Any:
+        for part in path:
+            if document is None:
+                return None
+            document = document.get(part)
+        return document
+
+    def mapper(document: Mapping) -> Any:
+        return factory(**{argument: read(document, path) for argument, path in items})
+
+    mapper.projection = {field: 1 for field in fields.values()}
+    return mapper
+
+
+_DUPLICATE_KEY_CODES = {11000, 11001, 12582}
+_INDEX_NAME_RE = re.compile(r'index: (\S+)')
+
+
+class MongoRepository:
+    """
+    Base for repositories bound to single collection.
+
+    Bulk methods send `bulk_write(ordered=False)` in chunks limited by operation count and encoded size.
+    Duplicate key failures do not stop the batch, they are collected and raised at the end as `BulkUniqueViolationException`
+    with ids written successfully in `inserted` and `{id: index name}` of rejected ones in `failed`.
+
+    With `cache` given `get_by_id` reads through it and every write made by the repository invalidates touched ids.
+    `find_raw`/`get_raw_by_id` return `RawBSONDocument`s, pair them with `document_mapper` to decode only needed fields.
+    Indexes listed in `__indexes__` are registered in `maio.lib.indexes.indexes` and created by `ensure_indexes()`.
+    """
+    __slots__ = ('collection', 'raw_collection', 'cache')
+
+    __collection__: str = None
+    __indexes__: Tuple[Index, ...] = ()
+
+    MAX_BATCH_COUNT = 1000
+    MAX_BATCH_BYTES = 8 * 1024 * 1024
+
+    class Fields:
+        __slots__ = ()
+        ID = '_id'
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.__collection__ and cls.__indexes__:
+            indexes.register(cls.__collection__, *cls.__indexes__)
+
+    def __init__(self, database: Database, cache: Optional[ReadThroughCache] = None):
+        self.collection = database.get_collection(self.__collection__)
+        self.raw_collection = raw_collection(self.collection)
+        self.cache = cache
+
+    @classmethod
+    async def ensure_indexes(cls, database: Database) -> Dict[str, List[str]]:
+        return await indexes.ensure(database, [cls.__collection__])
+
+    def find(self,
+             query: Dict,
+             sorting: Optional[List[Sort]] = None,
+             pagination: Optional[Pagination] = None,
+             projection: Optional[Dict[str, int]] = None):
+        return self._find(self.collection, query, sorting, pagination, projection)
+
+    def find_raw(self,
+                 query: Dict,
+                 sorting: Optional[List[Sort]] = None,
+                 pagination: Optional[Pagination] = None,
+                 projection: Optional[Dict[str, int]] = None):
+        """
+        Same as `find` but yields `RawBSONDocument`s decoded lazily on field access
+        """
+        return self._find(self.raw_collection, query, sorting, pagination, projection)
+
+    def _find(self, collection, query: Dict, sorting: Optional[List[Sort]], pagination: Optional[Pagination], projection: Optional[Dict[str, int]]):
+        sort = MongoSort.to_mongo([element for element in sorting or () if element.field])
+        advisor.record(self.__collection__, query, sort)
+
+        cursor = collection.find(query, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        if pagination:
+            cursor = cursor.skip(pagination.offset).limit(pagination.limit)
+
+        return cursor
+
+    async def get_raw_by_id(self, object_id: Any, projection: Optional[Dict[str, int]] = None) -> Optional[RawBSONDocument]:
+        return await self.raw_collection.find_one({self.Fields.ID: object_id}, projection)
+
+    async def get_by_id(self, object_id: Any) -> Optional[Dict]:
+        if self.cache is not None:
+            return await self.cache.get(object_id, lambda: self.collection.find_one({self.Fields.ID: object_id}))
+
+        return await self.collection.find_one({self.Fields.ID: object_id})
+
+    async def insert_one(self, document: Dict) -> Any:
+        try:
+            result = await self.collection.insert_one(document)
+        except DuplicateKeyError as exception:
+            raise UniqueViolationException(self._index_name(exception.details))
+
+        self._invalidate(result.inserted_id)
+        return result.inserted_id
+
+    async def update_by_id(self, object_id: Any, update: Dict) -> UpdateOperationResult:
+        try:
+            result = await self.collection.update_one({self.Fields.ID: object_id}, update)
+        finally:
+            self._invalidate(object_id)
+
+        return UpdateOperationResult(result.matched_count, result.modified_count)
+
+    async def update_set_by_id(self, object_id: Any, changes: Dict) -> UpdateOperationResult:
+        return await self.update_by_id(object_id, Mongo.update_set(changes))
+
+    async def delete_by_id(self, object_id: Any) -> bool:
+        try:
+            result = await self.collection.delete_one({self.Fields.ID: object_id})
+        finally:
+            self._invalidate(object_id)
+
+        return result.deleted_count == 1
+
+    def _invalidate(self, object_id: Any):
+        if self.cache is not None:
+            self.cache.invalidate(object_id)
+
+    async def insert_many(self, documents: Iterable[Dict]) -> List[Any]:
+        _ = self.Fields
+        codec_options = self.collection.codec_options
+
+        def operations():
+            for document in documents:
+                if _.ID not in document:
+                    document[_.ID] = ObjectId()
+                raw = RawBSONDocument(bson.encode(document, codec_options=codec_options), codec_options=codec_options)
+                yield document[_.ID], InsertOne(raw), len(raw.raw)
+
+        return await self._bulk_write(operations())
+
+    async def upsert_many(self, documents: Iterable[Dict]) -> List[Any]:
+        _ = self.Fields
+
+        def operations():
+            for document in documents:
+                object_id = document[_.ID]
+                changes = {key: value for key, value in document.items() if key != _.ID}
+                query = {_.ID: object_id}
+                update = Mongo.update_set(changes)
+                yield object_id, UpdateOne(query, update, upsert=True), self._encoded_size(query, update)
+
+        return await self._bulk_write(operations())
+
+    async def update_many_by_id(self, updates: Union[Dict[Any, Dict], Iterable[Tuple[Any, Dict]]]) -> List[Any]:
+        """
+        Applies update documents (`{'$set': ...}`, `{'$inc': ...}`) given per id
+        """
+        _ = self.Fields
+
+        if isinstance(updates, dict):
+            updates = updates.items()
+
+        def operations():
+            for object_id, update in updates:
+                query = {_.ID: object_id}
+                yield object_id, UpdateOne(query, update), self._encoded_size(query, update)
+
+        return await self._bulk_write(operations())
+
+    def _encoded_size(self, *documents: Dict) -> int:
+        codec_options = self.collection.codec_options
+        return sum(len(bson.encode(document, codec_options=codec_options)) for document in documents)
+
+    def _chunks(self, operations: Iterable[Tuple[Any, Any, int]]) -> Iterator[List[Tuple[Any, Any]]]:
+        max_count = self.MAX_BATCH_COUNT
+        max_bytes = self.MAX_BATCH_BYTES
+
+        chunk = []
+        chunk_bytes = 0
+
+        for object_id, operation, size in operations:
+            if chunk and (len(chunk) >= max_count or chunk_bytes + size > max_bytes):
+                yield chunk
+                chunk = []
+                chunk_bytes = 0
+
+            chunk.append((object_id, operation))
+            chunk_bytes += size
+
+        if chunk:
+            yield chunk
+
+    async def _bulk_write(self, operations: Iterable[Tuple[Any, Any, int]]) -> List[Any]:
+        written = []
+        failed = {}
+
+        for chunk in self._chunks(operations):
+            try:
+                await self.collection.bulk_write([operation for _, operation in chunk], ordered=False)
+                written.extend(object_id for object_id, _ in chunk)
+
+            except BulkWriteError as exception:
+                chunk_failed = {}
+                for error in exception.details.get('writeErrors', []):
+                    if error.get('code') not in _DUPLICATE_KEY_CODES:
+                        raise
+                    chunk_failed[error['index']] = self._index_name(error)
+
+                for index, (object_id, _) in enumerate(chunk):
+                    if index in chunk_failed:
+                        failed[object_id] = chunk_failed[index]
+                    else:
+                        written.append(object_id)
+
+            finally:
+                if self.cache is not None:
+                    self.cache.invalidate_many(object_id for object_id, _ in chunk)
+
+        if failed:
+            raise BulkUniqueViolationException(written, failed)
+
+        return written
+
+    @staticmethod
+    def _index_name(details: Optional[Dict]) -> Optional[str]:
+        if not details:
+            return None
+
+        match = _INDEX_NAME_RE.search(details.get('errmsg', ''))
+        return match.group(1) if match else None
@@ -1,16 +1,39 @@
+import asyncio
+import mmap
+import weakref
+from collections import deque
 from dataclasses import dataclass
 from io import BytesIO
+from tempfile import TemporaryFile
 from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Deque,
     Dict,
+    List,
     Optional,
+    Sequence,
     Set,
+    Tuple,
+    Union,
 )
 
-import magic
 from aiohttp import BodyPartReader
 from aiohttp.web_request import Request
 
+from maio.lib.metrics import (
+    MetricsRegistry,
+    metrics,
+)
 from maio.lib.request.headers import ContentType
+from maio.lib.request.sinks import Sink
+from maio.lib.request.sniffing import (
+    Sniffer,
+    sniffer,
+)
+
+SinkFactory = Callable[[str, Optional[str]], Sink]
 
 
 class ReceiverException(BaseException):
@@ -56,6 +79,13 @@ class ContentTypeInvalidReceiverException(ReceiverException):
         super().__init__("CONTENT_TYPE.INVALID", additional={"expected": content_type})
 
 
+class FilenameInvalidReceiverException(ReceiverException):
+    __slots__ = ()
+
+    def __init__(self, filename: Optional[str]):
+        super().__init__("FILENAME.INVALID", additional={"filename": filename})
+
+
 class BodyTooLargeReceiverException(ReceiverException):
     __slots__ = ()
 
@@ -63,28 +93,197 @@ class BodyTooLargeReceiverException(ReceiverException):
         super().__init__("TOO_BIG", additional={"max": max_size})
 
 
-@dataclass
+class BodyBudgetExceededReceiverException(ReceiverException):
+    __slots__ = ()
+
+    def __init__(self, capacity: int):
+        super().__init__("BUDGET_EXCEEDED", additional={"max": capacity})
+
+
+class UploadBudget:
+    """
+    Bytes of upload parts all concurrent requests of worker may keep in memory, shared between `BodyReceiver`s.
+    Waiting requests are served in order, up to `timeout` seconds; with `0` they are rejected right away.
+    """
+    __slots__ = ('capacity', 'timeout', 'registry', 'used', '_waiters')
+
+    def __init__(self, capacity: int, timeout: float = 0.0, registry: MetricsRegistry = metrics):
+        self.capacity = capacity
+        self.timeout = timeout
+        self.registry = registry
+        self.used = 0
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+
+        registry.gauge('upload_budget_capacity').set(capacity)
+
+    def _reserve(self, size: int):
+        self.used += size
+        self.registry.gauge('upload_budget_used').set(self.used)
+
+    def _reject(self):
+        self.registry.counter('upload_budget_rejected').inc()
+        raise BodyBudgetExceededReceiverException(self.capacity)
+
+    def _wake(self):
+        waiters = self._waiters
+        while waiters and self.used + waiters[0][0] <= self.capacity:
+            size, future = waiters.popleft()
+            if not future.done():
+                self._reserve(size)
+                future.set_result(None)
+
+    async def acquire(self, size: int):
+        if size > self.capacity:
+            self._reject()
+
+        if not self._waiters and self.used + size <= self.capacity:
+            self._reserve(size)
+            return
+
+        if self.timeout <= 0:
+            self._reject()
+
+        waiter = (size, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self.registry.gauge('upload_budget_waiting').inc()
+
+        try:
+            await asyncio.wait_for(waiter[1], self.timeout)
+        except BaseException as exception:
+            if waiter[1].done() and not waiter[1].cancelled():
+                # bytes were granted while the waiter was being cancelled
+                self.release(size)
+            if isinstance(exception, asyncio.TimeoutError):
+                self._reject()
+            raise
+        finally:
+            self.registry.gauge('upload_budget_waiting').dec()
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                self._wake()
+
+    def release(self, size: int):
+        self.used -= size
+        self.registry.gauge('upload_budget_used').set(self.used)
+        self._wake()
+
+
+@dataclass(init=False)
 class Upload:
-    __slots__ = ('content', 'kind', 'name', 'filename', 'size')
-    content: bytes
+    """
+    Received part, kept in `BytesIO` or in temporary file once it grew over `BodyReceiver.spool_size`.
+    `view()` gives access without copying, `content` reads whole part into `bytes`.
+    `results` holds what sinks passed to `BodyReceiver` returned, by sink name.
+    Can still be built from `bytes`, given in place of `file` or as `content`.
+    In memory part holds its bytes of `UploadBudget` until closed, or until garbage collected when never closed.
+    """
+    __slots__ = ('file', 'kind', 'name', 'filename', 'size', 'results', '_release', '__weakref__')
+    file: BinaryIO
     kind: str
     name: str
     filename: str
     size: int
+    results: Dict[str, Any]
+
+    def __init__(self,
+                 file: Union[BinaryIO, bytes, None] = None,
+                 kind: Optional[str] = None,
+                 name: Optional[str] = None,
+                 filename: Optional[str] = None,
+                 size: Optional[int] = None,
+                 results: Optional[Dict[str, Any]] = None,
+                 content: Optional[bytes] = None,
+                 budget: Optional[UploadBudget] = None,
+                 reserved: int = 0):
+        if content is not None:
+            file = content
+        if isinstance(file, (bytes, bytearray, memoryview)):
+            size = len(file) if size is None else size
+            file = BytesIO(file)
+        if file is None:
+            raise TypeError("Upload needs file or content")
+
+        self.file = file
+        self.kind = kind
+        self.name = name
+        self.filename = filename
+        self.size = size or 0
+        self.results = results if results is not None else {}
+        self._release = weakref.finalize(self, budget.release, reserved) if budget and reserved else None
+
+    @property
+    def content(self) -> bytes:
+        if isinstance(self.file, BytesIO):
+            return self.file.getvalue()
+
+        self.file.seek(0)
+        return self.file.read()
+
+    def is_spooled(self) -> bool:
+        return not isinstance(self.file, BytesIO)
+
+    def view(self) -> Union[memoryview, mmap.mmap]:
+        """
+        Memory view or read only mmap of content, has to be released before `close()`
+        """
+        if isinstance(self.file, BytesIO):
+            return self.file.getbuffer()
+
+        if not self.size:
+            return memoryview(b'')
+
+        self.file.flush()
+        return mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        self.file.close()
+        if self._release:
+            self._release()
 
 
 class BodyReceiver:
-    __slots__ = ('max_size', 'kinds', 'content_type')
+    """
+    Parts bigger than `spool_size` are moved from memory to temporary file in `spool_dir`.
+    `sinks` are called with part name and filename for every part, created sinks get chunks as they are read
+    and are aborted, also for parts already received, when the request fails. Sink refusing the filename
+    with `ValueError` fails the request with `FilenameInvalidReceiverException`.
+    With `budget` every chunk kept in memory is reserved from it, part frees its bytes when it is spooled
+    to disk or when its `Upload` is closed or garbage collected.
+    """
+    __slots__ = ('max_size', 'kinds', 'content_type', 'spool_size', 'spool_dir', 'sinks', 'sniffer', 'budget')
     MAX_CHUNK_SIZE = 64 * 1024
-
-    def __init__(self, max_size: int, kinds: Optional[Set[str]], content_type: str = ContentType.MULTIPART_FORM):
+    SPOOL_SIZE = 1024 * 1024
+
+    def __init__(self,
+                 max_size: int,
+                 kinds: Optional[Set[str]],
+                 content_type: str = ContentType.MULTIPART_FORM,
+                 spool_size: int = SPOOL_SIZE,
+                 spool_dir: Optional[str] = None,
+                 sinks: Sequence[SinkFactory] = (),
+                 kind_sniffer: Sniffer = sniffer,
+                 budget: Optional[UploadBudget] = None):
         self.max_size = max_size
         self.kinds = kinds
         self.content_type = content_type
+        self.spool_size = spool_size
+        self.spool_dir = spool_dir
+        self.sinks = tuple(sinks)
+        self.sniffer = kind_sniffer
+        self.budget = budget
+
+    def _spool(self, content: BytesIO) -> BinaryIO:
+        spooled = TemporaryFile(dir=self.spool_dir)
+        spooled.write(content.getbuffer())
+        content.close()
+        return spooled
 
     async def receive(self, request: Request, names: Optional[Set[str]] = None) -> Dict[str, Upload]:
         uploads = {}
         content = None
+        sinks: List[Sink] = []
+        finished: List[Sink] = []
+        reserved = 0
         try:
             if not request.can_read_body:
                 raise BodyMissingReceiverException
@@ -111,6 +310,12 @@ class BodyReceiver:
 
                 content_size = 0
                 content = BytesIO()
+                sinks = []
+                try:
+                    for factory in self.sinks:
+                        sinks.append(factory(part.name, part.filename))
+                except ValueError:
+                    raise FilenameInvalidReceiverException(part.filename)
 
                 while not part.at_eof():
                     chunk = await part.read_chunk(self.MAX_CHUNK_SIZE)
@@ -118,12 +323,10 @@ class BodyReceiver:
                         break
 
                     if kind is None and self.kinds:
-                        kind = magic.from_buffer(chunk)
+                        kind = await self.sniffer.sniff(chunk)
                         if not kind:
                             raise ContentTypeInvalidReceiverException(content_type=self.content_type)
 
-                        kind = kind.split(",")[0].split(" ")[0]
-
                         if kind not in self.kinds:
                             raise ContentTypeInvalidReceiverException(content_type=self.content_type)
 
@@ -131,17 +334,44 @@ class BodyReceiver:
                     if content_size > self.max_size:
                         raise BodyTooLargeReceiverException(max_size=self.max_size)
 
+                    if content_size > self.spool_size and isinstance(content, BytesIO):
+                        content = self._spool(content)
+                        if reserved:
+                            self.budget.release(reserved)
+                            reserved = 0
+
+                    if self.budget and isinstance(content, BytesIO):
+                        await self.budget.acquire(len(chunk))
+                        reserved += len(chunk)
+
                     content.write(chunk)
+                    for sink in sinks:
+                        await sink.write(chunk)
+
+                results = {}
+                while sinks:
+                    sink = sinks.pop(0)
+                    finished.append(sink)
+                    results[sink.name] = await sink.close()
 
                 content.seek(0)
-                uploads[part.name] = Upload(content.getvalue(), kind, part.name, part.filename, content_size)
+                uploads[part.name] = Upload(content, kind, part.name, part.filename, content_size, results,
+                                            budget=self.budget, reserved=reserved)
+                content = None
+                reserved = 0
 
             if not uploads:
                 raise BodyPartMissingReceiver
 
             return uploads
 
-        except Exception as exception:
+        except BaseException as exception:
             if content:
                 content.close()
+            if reserved:
+                self.budget.release(reserved)
+            for sink in (*sinks, *finished):
+                await sink.abort()
+            for upload in uploads.values():
+                upload.close()
             raise exception
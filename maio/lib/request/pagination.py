@@ -43,3 +43,6 @@ class Pagination(NamedTuple):
 
     def need_count(self, count):
         return count == self.limit or (self.limit < self.offset and count == 0)
+
+    def look_ahead(self) -> 'Pagination':
+        return Pagination(self.limit + 1, self.offset)
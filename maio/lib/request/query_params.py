@@ -7,6 +7,7 @@ from enum import Enum
 from typing import (
     Any,
     Callable,
+    Dict,
     List,
     Optional,
     Set,
@@ -81,6 +82,54 @@ class DateRange:
         return False
 
 
+def parse_sort(sort: Optional[str], order: Optional[str], available_sort: Union[List[str], Tuple, Set[str]], default_sort: Optional[Sort]) -> Sort:
+    if sort is None or sort not in available_sort:
+        sort = default_sort.field if default_sort else None
+
+    direction = DirectionRequestMapper.from_str(order)
+
+    if direction is None:
+        direction = default_sort.direction if default_sort else AscDirection
+
+    return Sort(sort, direction)
+
+
+def parse_fields(value: Optional[str], allowed: Union[Set[str], Dict[str, str]], separator: str = ',') -> Tuple[Optional[Set[str]], Set[str]]:
+    """
+    Splits `fields=` value into fields present on allow-list and the rejected ones.
+    `None` means that client did not ask for sparse fieldset.
+    """
+    if not value:
+        return None, set()
+
+    requested = {element.strip() for element in value.split(separator)}
+    requested.discard('')
+
+    return requested.intersection(allowed), requested.difference(allowed)
+
+
+def parse_limit(value: Any, max_limit: int, default_limit: int) -> int:
+    try:
+        limit = int(value)
+        if not (0 < limit <= max_limit):
+            limit = default_limit
+    except (ValueError, TypeError):
+        limit = default_limit
+
+    return limit
+
+
+def parse_page(value: Any) -> int:
+    try:
+        page = int(value)
+        if 0 > page:
+            page = 0
+    except (ValueError, TypeError):
+        page = 0
+
+    return page
+
+
 class QueryParams:
     __slots__ = ('request', 'sort', 'limit', 'page')
 
@@ -91,6 +140,7 @@ class QueryParams:
         ORDER = 'order'
         PAGE = 'page'
         LIMIT = 'limit'
+        FIELDS = 'fields'
 
     def __init__(self, request: Request, sort: Optional[Sort], limit: int = 0, page: int = 0):
         self.request = request
@@ -106,35 +156,17 @@ class QueryParams:
                      max_limit: int = 50,
                      default_limit: int = 25):
         _ = cls.Fields
+        query = request.query
 
         if available_sort:
-            sort = request.query.getone(_.SORT, None)
-            if sort is None or sort not in available_sort:
-                sort = default_sort.field if default_sort else None
-
-            direction = DirectionRequestMapper.from_str(request.query.getone(_.ORDER, None))
-
-            if direction is None:
-                direction = default_sort.direction if default_sort else AscDirection
+            sort = parse_sort(query.getone(_.SORT, None), query.getone(_.ORDER, None), available_sort, default_sort)
         else:
-            sort = None
-            direction = None
-
-        try:
-            limit = int(request.query.getone(_.LIMIT, default_limit))
-            if not (0 < limit <= max_limit):
-                limit = default_limit
-        except (ValueError, TypeError):
-            limit = default_limit
+            sort = Sort(None, None)
 
-        try:
-            page = int(request.query.getone(_.PAGE, 0))
-            if 0 > page:
-                page = 0
-        except (ValueError, TypeError):
-            page = 0
+        limit = parse_limit(query.getone(_.LIMIT, default_limit), max_limit, default_limit)
+        page = parse_page(query.getone(_.PAGE, 0))
 
-        return cls(request, Sort(sort, direction), limit, page)
+        return cls(request, sort, limit, page)
 
     def get_sort(self) -> Sort:
         return self.sort
@@ -182,6 +214,10 @@ class QueryParams:
         else:
             return [element for element in self.get(name, "").split(separator) if element]
 
+    def get_fields(self, allowed: Union[Set[str], Dict[str, str]], field_name: Optional[str] = None, separator: str = ',') -> Optional[Set[str]]:
+        fields, _ = parse_fields(self.request.query.getone(field_name or self.Fields.FIELDS, None), allowed, separator)
+        return fields
+
     def get_date(self, field_name: str, format: str = "%d-%m-%Y", default=None) -> Optional[datetime]:
         value = self.request.query.getone(field_name, None)
 
@@ -0,0 +1,367 @@
+from datetime import datetime
+from enum import Enum
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
+
+from aiohttp.web_request import Request
+
+from maio.lib.errors import (
+    ERROR_MISSING,
+    Error,
+    INVALID_BOOL,
+    INVALID_DATE,
+    INVALID_DATETIME,
+    INVALID_NUMBER,
+    INVALID_OBJECT_ID,
+    INVALID_UUID,
+    too_big,
+    too_small,
+)
+from maio.lib.exceptions import ValidationException
+from maio.lib.parsers import (
+    parse_bool,
+    parse_date_to_unix_ts,
+    parse_int,
+    parse_object_id,
+    parse_uuid,
+)
+from maio.lib.request.pagination import (
+    Pagination,
+    Sort,
+)
+from maio.lib.request.query_params import (
+    DateRange,
+    QueryParams,
+    parse_fields,
+    parse_limit,
+    parse_page,
+    parse_sort,
+)
+
+
+class QueryField:
+    """
+    Declaration of single query parameter. Subclasses convert raw string value, `None` means parameter was absent.
+    """
+    __slots__ = ('key', 'default', 'required')
+
+    def __init__(self, key: Optional[str] = None, default: Optional[Any] = None, required: bool = False):
+        self.key = key
+        self.default = default
+        self.required = required
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.key,
+
+    def parse(self, raw: Dict[str, str], errors: Dict[str, Error]) -> Any:
+        value = raw.get(self.key)
+
+        if not value:
+            if self.required:
+                errors[self.key] = ERROR_MISSING
+            return self.default
+
+        return self.convert(value, errors)
+
+    def convert(self, value: str, errors: Dict[str, Error]) -> Any:
+        return value
+
+
+class StrField(QueryField):
+    __slots__ = ('min_len',)
+
+    def __init__(self, key: Optional[str] = None, default: Optional[str] = None, required: bool = False, min_len: int = -1):
+        super().__init__(key, default, required)
+        self.min_len = min_len
+
+    def convert(self, value: str, errors: Dict[str, Error]) -> Optional[str]:
+        if self.min_len != -1 and len(value) < self.min_len:
+            errors[self.key] = too_small(self.min_len)
+            return self.default
+        return value
+
+
+class IntField(QueryField):
+    __slots__ = ('min_val', 'max_val')
+
+    def __init__(self, key: Optional[str] = None, default: Optional[int] = None, required: bool = False, min_val: int = None, max_val: int = None):
+        super().__init__(key, default, required)
+        self.min_val = min_val
+        self.max_val = max_val
+
+    def convert(self, value: str, errors: Dict[str, Error]) -> Optional[int]:
+        value = parse_int(value, None)
+
+        if value is None:
+            errors[self.key] = INVALID_NUMBER
+            return self.default
+        if self.min_val is not None and value < self.min_val:
+            errors[self.key] = too_small(self.min_val)
+        elif self.max_val is not None and value > self.max_val:
+            errors[self.key] = too_big(self.max_val)
+
+        return value
+
+
+class BoolField(QueryField):
+    __slots__ = ()
+
+    def convert(self, value: str, errors: Dict[str, Error]) -> Optional[bool]:
+        value = parse_bool(value, None)
+
+        if value is None:
+            errors[self.key] = INVALID_BOOL
+            return self.default
+
+        return value
+
+
+class UUIDField(QueryField):
+    __slots__ = ()
+
+    def convert(self, value: str, errors: Dict[str, Error]) -> Any:
+        value = parse_uuid(value)
+
+        if value is None:
+            errors[self.key] = INVALID_UUID
+            return self.default
+
+        return value
+
+
+class ObjectIdField(QueryField):
+    __slots__ = ()
+
+    def convert(self, value: str, errors: Dict[str, Error]) -> Any:
+        value = parse_object_id(value)
+
+        if value is None:
+            errors[self.key] = INVALID_OBJECT_ID
+            return self.default
+
+        return value
+
+
+class TimestampField(QueryField):
+    __slots__ = ()
+
+    def convert(self, value: str, errors: Dict[str, Error]) -> Optional[int]:
+        value = parse_date_to_unix_ts(value)
+
+        if value is None:
+            errors[self.key] = INVALID_DATETIME
+            return self.default
+
+        return value
+
+
+class EnumField(QueryField):
+    __slots__ = ('enum_clazz',)
+
+    def __init__(self, enum_clazz: Type[Enum], key: Optional[str] = None, default: Optional[Enum] = None, required: bool = False):
+        super().__init__(key, default, required)
+        self.enum_clazz = enum_clazz
+
+    def convert(self, value: str, errors: Dict[str, Error]) -> Optional[Enum]:
+        try:
+            return self.enum_clazz[value.upper()]
+        except KeyError:
+            errors[self.key] = Error("INVALID_KIND", {"expected": f"one of {[element.name.lower() for element in self.enum_clazz]}"})
+            return self.default
+
+
+class ListField(QueryField):
+    __slots__ = ('separator', 'mapper')
+
+    def __init__(self,
+                 key: Optional[str] = None,
+                 separator: str = ',',
+                 mapper: Optional[Callable[[str], Any]] = None,
+                 default: Optional[List] = None,
+                 required: bool = False):
+        super().__init__(key, default, required)
+        self.separator = separator
+        self.mapper = mapper
+
+    def parse(self, raw: Dict[str, str], errors: Dict[str, Error]) -> List[Any]:
+        value = super().parse(raw, errors)
+        return [] if value is None else value
+
+    def convert(self, value: str, errors: Dict[str, Error]) -> List[Any]:
+        mapper = self.mapper
+        if mapper:
+            return [mapper(element) for element in value.split(self.separator) if element]
+        else:
+            return [element for element in value.split(self.separator) if element]
+
+
+class DateField(QueryField):
+    __slots__ = ('format',)
+
+    def __init__(self, key: Optional[str] = None, format: str = "%d-%m-%Y", default: Optional[datetime] = None, required: bool = False):
+        super().__init__(key, default, required)
+        self.format = format
+
+    def convert(self, value: str, errors: Dict[str, Error]) -> Optional[datetime]:
+        try:
+            return datetime.strptime(value, self.format)
+        except (ValueError, TypeError):
+            errors[self.key] = INVALID_DATE
+            return self.default
+
+
+class DateRangeField(QueryField):
+    """
+    Reads `<key>From` and `<key>End` parameters, same as `QueryParams.get_date_range`
+    """
+    __slots__ = ('format', 'begin', 'end')
+
+    def __init__(self, key: Optional[str] = None, format: str = "%d-%m-%Y", default: Optional[DateRange] = None, required: bool = False):
+        super().__init__(key, default, required)
+        self.format = format
+        self.begin = DateField(format=format)
+        self.end = DateField(format=format)
+
+    def keys(self) -> Tuple[str, ...]:
+        self.begin.key = f"{self.key}From"
+        self.end.key = f"{self.key}End"
+        return self.begin.key, self.end.key
+
+    def parse(self, raw: Dict[str, str], errors: Dict[str, Error]) -> Optional[DateRange]:
+        begin = self.begin.parse(raw, errors)
+        end = self.end.parse(raw, errors)
+
+        if begin or end:
+            return DateRange(begin, end)
+
+        if self.required:
+            errors[self.key] = ERROR_MISSING
+        return self.default
+
+
+class FieldsField(QueryField):
+    """
+    Sparse fieldset (`?fields=a,b`) checked against route allow-list.
+    Allow-list can map public names to document fields, see `Mongo.projection`.
+    """
+    __slots__ = ('allowed', 'separator')
+
+    def __init__(self, allowed: Union[Set[str], Dict[str, str]], key: Optional[str] = None, separator: str = ','):
+        super().__init__(key or QueryParams.Fields.FIELDS)
+        self.allowed = allowed
+        self.separator = separator
+
+    def convert(self, value: str, errors: Dict[str, Error]) -> Optional[Set[str]]:
+        fields, rejected = parse_fields(value, self.allowed, self.separator)
+
+        if rejected:
+            errors[self.key] = Error("INVALID_KIND", {"expected": f"fields from set {set(self.allowed)}"})
+
+        return fields or None
+
+
+class QueryResult:
+    __slots__ = ('sort', 'pagination', 'errors')
+
+    sort: Sort
+    pagination: Pagination
+    errors: Dict[str, Error]
+
+    def is_valid(self) -> bool:
+        return not self.errors
+
+    def validate(self) -> 'QueryResult':
+        if self.errors:
+            raise ValidationException(parameters=dict(self.errors))
+        return self
+
+
+class QuerySchema:
+    """
+    Query parameters declared once per route.
+
+    Declaration is compiled into single parser that reads the query `MultiDict` in one pass and
+    returns slotted `QueryResult` subclass with one attribute per declared field.
+
+        LIST_QUERY = QuerySchema({'active': BoolField(), 'created': DateRangeField()}, available_sort={'name'})
+        query = LIST_QUERY.parse(request).validate()
+    """
+    __slots__ = ('fields', 'available_sort', 'default_sort', 'max_limit', 'default_limit', 'result_class', '_parser')
+
+    def __init__(self,
+                 fields: Dict[str, QueryField],
+                 available_sort: Union[List[str], Tuple, Set[str]] = None,
+                 default_sort: Optional[Sort] = None,
+                 max_limit: int = 50,
+                 default_limit: int = 25,
+                 name: str = 'Query'):
+        reserved = set(QueryResult.__slots__).intersection(fields)
+        if reserved:
+            raise ValueError(f"Query fields {reserved} are reserved")
+
+        self.fields = fields
+        self.available_sort = frozenset(available_sort) if available_sort else None
+        self.default_sort = default_sort
+        self.max_limit = max_limit
+        self.default_limit = default_limit
+        self.result_class = type(f'{name}Result', (QueryResult,), {'__slots__': tuple(fields.keys())})
+        self._parser = self._compile()
+
+    def _compile(self) -> Callable[[Any], QueryResult]:
+        _ = QueryParams.Fields
+        result_class = self.result_class
+        available_sort = self.available_sort
+        default_sort = self.default_sort
+        max_limit = self.max_limit
+        default_limit = self.default_limit
+
+        wanted = {_.SORT, _.ORDER, _.LIMIT, _.PAGE}
+        parsers = []
+        for name, field in self.fields.items():
+            if field.key is None:
+                field.key = name
+            wanted.update(field.keys())
+            parsers.append((name, field.parse))
+
+        wanted = frozenset(wanted)
+        parsers = tuple(parsers)
+
+        def parser(query) -> QueryResult:
+            raw = {}
+            for key, value in query.items():
+                if key in wanted and key not in raw:
+                    raw[key] = value
+
+            errors = {}
+            result = result_class()
+
+            for attribute, parse in parsers:
+                setattr(result, attribute, parse(raw, errors))
+
+            if available_sort:
+                result.sort = parse_sort(raw.get(_.SORT), raw.get(_.ORDER), available_sort, default_sort)
+            else:
+                result.sort = Sort(None, None)
+
+            limit = parse_limit(raw.get(_.LIMIT, default_limit), max_limit, default_limit)
+            result.pagination = Pagination(limit, parse_page(raw.get(_.PAGE, 0)) * limit)
+            result.errors = errors
+
+            return result
+
+        return parser
+
+    def parse(self, request: Request) -> QueryResult:
+        return self._parser(request.query)
+
+    def parse_query(self, query) -> QueryResult:
+        return self._parser(query)
@@ -0,0 +1,126 @@
+import hashlib
+import os
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Optional,
+)
+from uuid import uuid4
+
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+
+class Sink:
+    """
+    Stage fed with every chunk of uploaded part while `BodyReceiver` reads it,
+    result of `close()` lands in `Upload.results` under `name`
+    """
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    async def write(self, chunk: bytes):
+        raise NotImplementedError
+
+    async def close(self) -> Any:
+        raise NotImplementedError
+
+    async def abort(self):
+        pass
+
+
+class HashSink(Sink):
+    __slots__ = ('digest',)
+
+    def __init__(self, algorithm: str = 'sha256'):
+        super().__init__(algorithm)
+        self.digest = hashlib.new(algorithm)
+
+    async def write(self, chunk: bytes):
+        self.digest.update(chunk)
+
+    async def close(self) -> str:
+        return self.digest.hexdigest()
+
+
+class SizeSink(Sink):
+    __slots__ = ('size',)
+
+    def __init__(self):
+        super().__init__('size')
+        self.size = 0
+
+    async def write(self, chunk: bytes):
+        self.size += len(chunk)
+
+    async def close(self) -> int:
+        return self.size
+
+
+class FileSink(Sink):
+    """
+    Writes part to new file in `directory`, removed again when upload fails.
+    File is named by random prefix and base name of `filename`, so uploads of the same name do not collide;
+    empty and hidden names raise `ValueError`.
+    """
+    __slots__ = ('path', 'file')
+
+    def __init__(self, directory: str, filename: Optional[str] = None):
+        super().__init__('path')
+        if filename is not None:
+            filename = os.path.basename(filename.replace('\\', '/'))
+            if not filename or filename.startswith('.'):
+                raise ValueError("Invalid filename")
+
+        self.path = os.path.join(directory, f'{uuid4().hex}_{filename}' if filename else uuid4().hex)
+        self.file = open(self.path, 'xb')
+
+    async def write(self, chunk: bytes):
+        self.file.write(chunk)
+
+    async def close(self) -> str:
+        self.file.close()
+        return self.path
+
+    async def abort(self):
+        self.file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class GridFSSink(Sink):
+    __slots__ = ('stream',)
+
+    def __init__(self, bucket: AsyncIOMotorGridFSBucket, filename: str, metadata: Optional[dict] = None):
+        super().__init__('gridfs')
+        self.stream = bucket.open_upload_stream(filename, metadata=metadata)
+
+    async def write(self, chunk: bytes):
+        await self.stream.write(chunk)
+
+    async def close(self) -> Any:
+        await self.stream.close()
+        return self.stream._id
+
+    async def abort(self):
+        await self.stream.abort()
+
+
+class CallbackSink(Sink):
+    __slots__ = ('callback', 'finish')
+
+    def __init__(self, name: str, callback: Callable[[bytes], Awaitable], finish: Optional[Callable[[], Awaitable[Any]]] = None):
+        super().__init__(name)
+        self.callback = callback
+        self.finish = finish
+
+    async def write(self, chunk: bytes):
+        await self.callback(chunk)
+
+    async def close(self) -> Any:
+        if self.finish:
+            return await self.finish()
@@ -0,0 +1,92 @@
+import asyncio
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import (
+    Optional,
+    Tuple,
+)
+
+import magic
+
+from maio.lib.metrics import (
+    MetricsRegistry,
+    metrics,
+)
+
+_ZIP_ENTRY = b'PK\x03\x04'
+_ZIP_EMPTY = b'PK\x05\x06'
+_OOXML_ENTRIES = (b'[Content_Types].xml', b'_rels/.rels')
+
+SIGNATURES: Tuple[Tuple[bytes, str], ...] = (
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'%PDF-', 'PDF'),
+    (_ZIP_EMPTY, 'Zip'),
+)
+
+
+def _zip_kind(chunk: bytes) -> Optional[str]:
+    if len(chunk) < 30:
+        return None
+
+    name_length = struct.unpack_from('<H', chunk, 26)[0]
+    name = chunk[30:30 + name_length]
+    if len(name) < name_length:
+        return None
+
+    if name in _OOXML_ENTRIES:
+        return 'Microsoft'
+    if name == b'mimetype':
+        # OpenDocument, let libmagic name it
+        return None
+    return 'Zip'
+
+
+def match_signature(chunk: bytes) -> Optional[str]:
+    """
+    Kind of content by its leading bytes, named as first word of libmagic description, `None` when unknown
+    """
+    if chunk.startswith(_ZIP_ENTRY):
+        return _zip_kind(chunk)
+
+    for signature, kind in SIGNATURES:
+        if chunk.startswith(signature):
+            return kind
+
+    return None
+
+
+class Sniffer:
+    """
+    Detects kind from signature table and falls back to libmagic run in thread pool of `max_workers`
+    """
+    __slots__ = ('executor', 'registry')
+
+    def __init__(self, max_workers: int = 2, registry: MetricsRegistry = metrics):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='magic')
+        self.registry = registry
+
+    @staticmethod
+    def _magic(chunk: bytes) -> Optional[str]:
+        description = magic.from_buffer(chunk)
+        if not description:
+            return None
+
+        return description.split(",")[0].split(" ")[0]
+
+    async def sniff(self, chunk: bytes) -> Optional[str]:
+        started = perf_counter()
+        kind = match_signature(chunk)
+
+        if kind is not None:
+            self.registry.histogram('upload_sniff_ms', path='signature').observe((perf_counter() - started) * 1000)
+            return kind
+
+        kind = await asyncio.get_running_loop().run_in_executor(self.executor, self._magic, chunk)
+        self.registry.histogram('upload_sniff_ms', path='libmagic').observe((perf_counter() - started) * 1000)
+
+        return kind
+
+
+sniffer = Sniffer()
@@ -0,0 +1,247 @@
+import asyncio
+import posixpath
+import zipfile
+from typing import (
+    Any,
+    AsyncIterator,
+    BinaryIO,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+from xml.etree.ElementTree import (
+    Element,
+    ParseError,
+    iterparse,
+)
+
+from maio.lib.request.body_receiver import (
+    ReceiverException,
+    Upload,
+)
+
+Row = List[Any]
+
+_RELATIONSHIP_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+
+MAX_ROWS = 1048576
+MAX_COLUMNS = 16384
+
+
+class SpreadsheetInvalidReceiverException(ReceiverException):
+    __slots__ = ()
+
+    def __init__(self, reason: str):
+        super().__init__("SPREADSHEET.INVALID", additional={"reason": reason})
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def _column(reference: str) -> int:
+    column = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        column = column * 26 + ord(char.upper()) - 64
+    return column - 1
+
+
+def _text(element: Element) -> str:
+    """
+    Text of `si`/`is` element, runs joined, phonetic hints skipped
+    """
+    parts = []
+    for child in element:
+        name = _local(child.tag)
+        if name == 't':
+            parts.append(child.text or '')
+        elif name == 'r':
+            parts.extend(run.text or '' for run in child if _local(run.tag) == 't')
+    return ''.join(parts)
+
+
+def _number(value: str) -> Union[int, float]:
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+class XlsxReader:
+    """
+    Reads rows of XLSX sheet incrementally from ZIP entries with `iterparse`, only shared strings table and
+    current row are kept in memory. Values are `str`, `int`, `float`, `bool` or `None`, dates stay serial numbers
+    except cells stored as ISO 8601 text (`t="d"`), which are returned as `str`.
+    Shared strings and sheet entries uncompressing to more than `max_entry_size` bytes are rejected.
+    """
+    __slots__ = ('archive', 'sheets', 'max_entry_size', '_shared_strings')
+
+    MAX_ENTRY_SIZE = 256 * 1024 * 1024
+
+    def __init__(self, source: Union[Upload, BinaryIO], max_entry_size: int = MAX_ENTRY_SIZE):
+        file = source.file if isinstance(source, Upload) else source
+        self.max_entry_size = max_entry_size
+
+        try:
+            self.archive = zipfile.ZipFile(file)
+            self.sheets = self._read_sheets()
+        except (zipfile.BadZipFile, KeyError, ParseError) as exception:
+            raise SpreadsheetInvalidReceiverException(str(exception))
+
+        self._shared_strings: Optional[List[str]] = None
+
+    def close(self):
+        self.archive.close()
+
+    def _open(self, path: str):
+        if self.archive.getinfo(path).file_size > self.max_entry_size:
+            raise SpreadsheetInvalidReceiverException(f"{path} larger than {self.max_entry_size} bytes")
+        return self.archive.open(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _read_sheets(self) -> Dict[str, str]:
+        targets = {}
+        with self.archive.open('xl/_rels/workbook.xml.rels') as rels:
+            for _, element in iterparse(rels):
+                if _local(element.tag) == 'Relationship':
+                    target = element.get('Target')
+                    if not target:
+                        raise SpreadsheetInvalidReceiverException(f"relationship {element.get('Id')} without target")
+                    targets[element.get('Id')] = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+
+        sheets = {}
+        with self.archive.open('xl/workbook.xml') as workbook:
+            for _, element in iterparse(workbook):
+                if _local(element.tag) == 'sheet':
+                    sheets[element.get('name')] = targets[element.get(_RELATIONSHIP_ID)]
+
+        return sheets
+
+    @property
+    def shared_strings(self) -> List[str]:
+        if self._shared_strings is None:
+            strings = []
+
+            if 'xl/sharedStrings.xml' in self.archive.namelist():
+                with self._open('xl/sharedStrings.xml') as source:
+                    for _, element in iterparse(source):
+                        if _local(element.tag) == 'si':
+                            strings.append(_text(element))
+                            element.clear()
+
+            self._shared_strings = strings
+
+        return self._shared_strings
+
+    @staticmethod
+    def _value(cell: Element, strings: List[str]) -> Any:
+        kind = cell.get('t', 'n')
+        value = None
+
+        for child in cell:
+            name = _local(child.tag)
+            if name == 'v':
+                value = child.text
+            elif name == 'is':
+                return _text(child)
+
+        if value is None:
+            return None
+        if kind == 's':
+            return strings[int(value)]
+        if kind == 'b':
+            return value == '1'
+        if kind in ('str', 'e', 'inlineStr', 'd'):
+            return value
+        return _number(value)
+
+    def iter_rows(self, sheet: Optional[Union[str, int]] = 0) -> Iterator[Row]:
+        if isinstance(sheet, int):
+            names = list(self.sheets)
+            if sheet >= len(names):
+                raise SpreadsheetInvalidReceiverException(f"sheet {sheet} missing")
+            sheet = names[sheet]
+
+        path = self.sheets.get(sheet)
+        if path is None:
+            raise SpreadsheetInvalidReceiverException(f"sheet {sheet} missing")
+
+        # shared strings are parsed before the sheet stream is opened
+        strings = self.shared_strings
+        sheet_data = None
+        expected = 0
+
+        try:
+            with self._open(path) as source:
+                for event, element in iterparse(source, events=('start', 'end')):
+                    name = _local(element.tag)
+
+                    if event == 'start':
+                        if name == 'sheetData':
+                            sheet_data = element
+                        continue
+
+                    if name != 'row':
+                        continue
+
+                    index = int(element.get('r', expected + 1)) - 1
+                    if not 0 <= index < MAX_ROWS:
+                        raise SpreadsheetInvalidReceiverException(f"row {index + 1} out of range")
+                    # rows left out by Excel are empty
+                    for _ in range(expected, index):
+                        yield []
+                    expected = index + 1
+
+                    row: Row = []
+                    for cell in element:
+                        if _local(cell.tag) != 'c':
+                            continue
+                        reference = cell.get('r')
+                        if reference:
+                            column = _column(reference)
+                            if column >= MAX_COLUMNS:
+                                raise SpreadsheetInvalidReceiverException(f"cell {reference} out of range")
+                            if column > len(row):
+                                row.extend([None] * (column - len(row)))
+                        row.append(self._value(cell, strings))
+
+                    yield row
+
+                    if sheet_data is not None:
+                        sheet_data.clear()
+                    else:
+                        element.clear()
+        except (ParseError, KeyError, IndexError, ValueError) as exception:
+            raise SpreadsheetInvalidReceiverException(str(exception))
+
+    async def rows(self, sheet: Optional[Union[str, int]] = 0, batch_size: int = 500) -> AsyncIterator[Row]:
+        """
+        Parses `batch_size` rows at a time in default executor, so event loop keeps running between batches
+        """
+        loop = asyncio.get_running_loop()
+        iterator = self.iter_rows(sheet)
+
+        def next_batch() -> Tuple[List[Row], bool]:
+            batch = []
+            for row in iterator:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    return batch, False
+            return batch, True
+
+        while True:
+            batch, finished = await loop.run_in_executor(None, next_batch)
+            for row in batch:
+                yield row
+            if finished:
+                return
@@ -3,6 +3,9 @@ from functools import singledispatch
 from http import HTTPStatus
 from typing import (
     Any,
+    Dict,
+    Iterable,
+    List,
     Optional,
     Union
 )
@@ -23,6 +26,32 @@ def json_serializer(value):
     return str(value)
 
 
+def sparse_fields(data: Union[Dict, List[Dict]], fields: Optional[Iterable[str]]) -> Union[Dict, List[Dict]]:
+    """
+    Keeps only requested fields of serialized object (or list of them), dotted names select nested values
+    """
+    if not fields:
+        return data
+
+    if isinstance(data, list):
+        return [sparse_fields(element, fields) for element in data if isinstance(element, (dict, list))]
+
+    selected = {}
+    nested = {}
+    for field in fields:
+        name, _, rest = field.partition('.')
+        if rest:
+            nested.setdefault(name, []).append(rest)
+        elif name in data:
+            selected[name] = data[name]
+
+    for name, rest in nested.items():
+        if name not in selected and isinstance(data.get(name), (dict, list)):
+            selected[name] = sparse_fields(data[name], rest)
+
+    return selected
+
+
 class JsonResponse(Response):
     __slots__ = ()
 
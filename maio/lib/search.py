@@ -0,0 +1,141 @@
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+)
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+
+from maio.lib.indexes import Index
+from maio.lib.ngram import (
+    ngram,
+    normalize,
+)
+from maio.lib.repository import Mongo
+
+
+class NgramSearch:
+    """
+    Substring search backed by indexed array of n-grams stored on each document.
+
+    `tokens()`/`update()` compute the array on write, `backfill()` fills it for existing documents.
+    `match()` replaces unanchored `Mongo.match_string_contains` regex scans with multikey index lookups,
+    `pipeline()` additionally ranks partial matches by number of shared n-grams.
+    Both are candidate filters - a document with all n-grams of the text does not have to contain it as one substring.
+    """
+    __slots__ = ('fields', 'target', 'length')
+
+    class Fields:
+        __slots__ = ()
+        SCORE = '_score'
+        SIZE = '_size'
+
+    def __init__(self, fields: Iterable[str], target: str = 'search_tokens', length: int = 3):
+        self.fields = tuple(fields)
+        self.target = target
+        self.length = length
+
+    def index(self) -> Index:
+        return Index(self.target)
+
+    def _tokenize(self, value: str) -> Set[str]:
+        value = normalize(value)
+        if not value:
+            return set()
+
+        tokens = set(ngram(value, self.length)) if len(value) >= self.length else {value}
+        # trailing partial grams let texts shorter than n-gram match at the end of value
+        tokens.update(value[-size:] for size in range(1, min(self.length, len(value) + 1)))
+
+        return tokens
+
+    def tokens(self, document: Dict[str, Any]) -> List[str]:
+        tokens = set()
+
+        for field in self.fields:
+            value = document
+            for part in field.split('.'):
+                value = value.get(part) if isinstance(value, dict) else None
+
+            if isinstance(value, str):
+                tokens.update(self._tokenize(value))
+            elif isinstance(value, (list, tuple)):
+                for element in value:
+                    if isinstance(element, str):
+                        tokens.update(self._tokenize(element))
+
+        return sorted(tokens)
+
+    def update(self, document: Dict[str, Any], update: Optional[Dict] = None) -> Dict:
+        if update is None or '$set' not in update:
+            return Mongo.update_set({self.target: self.tokens(document)}, update)
+
+        update['$set'][self.target] = self.tokens(document)
+        return update
+
+    def match(self, text: str) -> Optional[Dict]:
+        """
+        Condition matching documents having all n-grams of `text` (every document containing `text` among them),
+        `None` when there is nothing to search for
+        """
+        value = normalize(text)
+        if not value:
+            return None
+
+        if len(value) < self.length:
+            return {self.target: Mongo.match_string_starts(value)}
+
+        return {self.target: {'$all': sorted(set(ngram(value, self.length)))}}
+
+    def pipeline(self, text: str, limit: int = 25, min_score: float = 0.5, query: Optional[Dict] = None) -> Mongo.Pipeline:
+        """
+        Ranked search, document has to share at least `min_score` of query n-grams
+        """
+        _ = self.Fields
+        value = normalize(text)
+        tokens = sorted(set(ngram(value, self.length))) if len(value) >= self.length else []
+
+        pipeline = Mongo.Pipeline()
+
+        if not tokens:
+            match = self.match(text) or {}
+            return pipeline.match({**(query or {}), **match}).limit(limit)
+
+        pipeline.match({**(query or {}), self.target: Mongo.match_in(tokens)})
+        pipeline.stage({'$addFields': {
+            _.SCORE: {'$size': {'$setIntersection': [f'${self.target}', {'$literal': tokens}]}},
+            _.SIZE: {'$size': f'${self.target}'}
+        }})
+        pipeline.match({_.SCORE: Mongo.match_greater_than(max(1, int(len(tokens) * min_score)))})
+        pipeline.sort([(_.SCORE, -1), (_.SIZE, 1)])
+        pipeline.limit(limit)
+        pipeline.stage({'$project': {self.target: 0, _.SIZE: 0}})
+
+        return pipeline
+
+    async def backfill(self, collection: AsyncIOMotorCollection, batch_size: int = 1000, query: Optional[Dict] = None) -> int:
+        """
+        Computes tokens for documents matching `query` in `_id` order, one `bulk_write` per batch
+        """
+        projection = {field: 1 for field in self.fields}
+        query = dict(query or {})
+        last_id = None
+        updated = 0
+
+        while True:
+            batch_query = query if last_id is None else {'$and': [query, {'_id': Mongo.match_greater_than(last_id, False)}]}
+            documents = await collection.find(batch_query, projection).sort('_id', 1).limit(batch_size).to_list(batch_size)
+
+            if not documents:
+                return updated
+
+            await collection.bulk_write([UpdateOne({'_id': document['_id']}, Mongo.update_set({self.target: self.tokens(document)}))
+                                         for document in documents],
+                                        ordered=False)
+
+            updated += len(documents)
+            last_id = documents[-1]['_id']
@@ -0,0 +1,326 @@
+import struct
+import zlib
+from calendar import timegm
+from datetime import datetime
+from time import time
+from multiprocessing import (
+    resource_tracker,
+    shared_memory
+)
+from typing import (
+    Dict,
+    Optional,
+    Tuple
+)
+from uuid import UUID
+
+from bson import ObjectId
+
+from maio.lib.session.model import (
+    DefaultSessionContainer,
+    Session
+)
+
+
+class SessionBackend:
+    __slots__ = ()
+
+    async def get_by_id(self, session_id: UUID) -> Optional[Session]:
+        raise NotImplementedError
+
+    async def insert(self, session: Session):
+        raise NotImplementedError
+
+    async def update_active_valid_till_by_id(self, valid_till: datetime, session_id: UUID) -> Optional[Session]:
+        raise NotImplementedError
+
+    async def delete_by_id(self, session_id: UUID) -> bool:
+        raise NotImplementedError
+
+    async def get_recent_by_id(self, session_id: UUID, max_age: float) -> Optional[Session]:
+        """
+        Session inserted at most `max_age` seconds ago, backends not tracking insert time return any stored one
+        """
+        return await self.get_by_id(session_id)
+
+
+class MemorySessionBackend(SessionBackend):
+    """
+    Sessions in dict of single process with time they were inserted, expired ones are dropped when `max_size` is reached
+    """
+    __slots__ = ('max_size', '_sessions')
+
+    def __init__(self, max_size: int = 100000):
+        self.max_size = max_size
+        self._sessions: Dict[UUID, Tuple[float, Session]] = {}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    async def get_by_id(self, session_id: UUID) -> Optional[Session]:
+        entry = self._sessions.get(session_id)
+        return entry[1] if entry else None
+
+    async def get_recent_by_id(self, session_id: UUID, max_age: float) -> Optional[Session]:
+        entry = self._sessions.get(session_id)
+        return entry[1] if entry and entry[0] >= time() - max_age else None
+
+    async def insert(self, session: Session):
+        sessions = self._sessions
+        if len(sessions) >= self.max_size and session.id not in sessions:
+            now = datetime.utcnow()
+            self._sessions = sessions = {key: value for key, value in sessions.items() if value[1].valid_till >= now}
+            if len(sessions) >= self.max_size:
+                del sessions[next(iter(sessions))]
+
+        sessions[session.id] = (time(), session)
+
+        return session.id
+
+    async def update_active_valid_till_by_id(self, valid_till: datetime, session_id: UUID) -> Optional[Session]:
+        session = await self.get_by_id(session_id)
+
+        if not session or not session.active or session.valid_till < datetime.utcnow():
+            return None
+
+        session.valid_till = valid_till
+
+        return session
+
+    async def delete_by_id(self, session_id: UUID) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+
+class SharedMemorySessionBackend(SessionBackend):
+    """
+    Sessions in fixed size slots of shared memory block visible to all workers on host.
+
+    Slot is picked by hashing session id with `PROBES` neighbours tried, a full neighbourhood overwrites
+    its first slot, so the backend is lossy and meant as local tier of `TieredSessionBackend`.
+    Slots carry CRC of their content, slot being written concurrently reads as missing.
+    Slots also carry time the session was inserted, so `get_recent_by_id` works across workers.
+    Only `DefaultSessionContainer` with UUID, ObjectId or int user id and tokens up to `max_token` bytes are kept.
+
+    Workers create or attach the block and only `close()` it, so recycled workers keep sharing it;
+    master process calls `SharedMemorySessionBackend.unlink(name)` on exit.
+    """
+    __slots__ = ('memory', 'slots', 'max_token', '_slot', '_size')
+
+    PROBES = 4
+    HEADER = '<16sddBB16sH'
+    EMPTY = 0
+
+    class UserKind:
+        __slots__ = ()
+        UUID = 1
+        OBJECT_ID = 2
+        INT = 3
+
+    def __init__(self, name: str, slots: int = 65536, max_token: int = 64):
+        self.slots = slots
+        self.max_token = max_token
+        self._slot = struct.Struct(f'{self.HEADER}{max_token}s')
+        self._size = self._slot.size + 4
+
+        try:
+            self.memory = shared_memory.SharedMemory(name)
+        except FileNotFoundError:
+            try:
+                self.memory = shared_memory.SharedMemory(name, create=True, size=self._size * slots)
+            except FileExistsError:
+                # other worker created it in the meantime
+                self.memory = shared_memory.SharedMemory(name)
+
+        # resource tracker of this worker would unlink the block on exit, only `unlink` removes it
+        resource_tracker.unregister(self.memory._name, 'shared_memory')
+
+        if self.memory.size < self._size * slots:
+            self.memory.close()
+            raise ValueError(f"Shared memory {name} is smaller than {slots} slots")
+
+    def close(self):
+        self.memory.close()
+
+    @staticmethod
+    def unlink(name: str) -> bool:
+        """
+        Removes the block, called by master process on exit
+        """
+        try:
+            memory = shared_memory.SharedMemory(name)
+        except FileNotFoundError:
+            return False
+
+        memory.close()
+        memory.unlink()
+        return True
+
+    def _positions(self, session_id: UUID):
+        start = int.from_bytes(session_id.bytes[:8], 'little') % self.slots
+        return [(start + probe) % self.slots * self._size for probe in range(self.PROBES)]
+
+    def _read(self, offset: int) -> Optional[Tuple]:
+        buffer = self.memory.buf
+        content = bytes(buffer[offset:offset + self._slot.size])
+        (checksum,) = struct.unpack_from('<I', buffer, offset + self._slot.size)
+
+        if checksum == 0 or zlib.crc32(content) != checksum:
+            return None
+
+        return self._slot.unpack(content)
+
+    def _write(self, offset: int, values: Optional[Tuple]):
+        buffer = self.memory.buf
+
+        if values is None:
+            struct.pack_into('<I', buffer, offset + self._slot.size, 0)
+            return
+
+        content = self._slot.pack(*values)
+        struct.pack_into('<I', buffer, offset + self._slot.size, 0)
+        buffer[offset:offset + self._slot.size] = content
+        struct.pack_into('<I', buffer, offset + self._slot.size, zlib.crc32(content))
+
+    def _find(self, session_id: UUID) -> Tuple[Optional[int], Optional[Tuple]]:
+        key = session_id.bytes
+        for offset in self._positions(session_id):
+            values = self._read(offset)
+            if values is not None and values[0] == key:
+                return offset, values
+        return None, None
+
+    def _pack(self, session: Session, stored_at: Optional[float] = None) -> Optional[Tuple]:
+        _ = self.UserKind
+        user_id = session.user_id
+
+        if type(session.container) is not DefaultSessionContainer:
+            return None
+        if isinstance(user_id, UUID):
+            kind, user = _.UUID, user_id.bytes
+        elif isinstance(user_id, ObjectId):
+            kind, user = _.OBJECT_ID, user_id.binary
+        elif isinstance(user_id, int) and -2 ** 63 <= user_id < 2 ** 63:
+            kind, user = _.INT, user_id.to_bytes(8, 'little', signed=True)
+        else:
+            return None
+
+        token = (session.token or '').encode()
+        if len(token) > self.max_token:
+            return None
+
+        valid_till = timegm(session.valid_till.utctimetuple()) + session.valid_till.microsecond / 1e6
+        stored_at = time() if stored_at is None else stored_at
+
+        return session.id.bytes, valid_till, stored_at, session.active, kind, user, len(token), token
+
+    def _unpack(self, values: Tuple) -> Session:
+        _ = self.UserKind
+        session_id, valid_till, _stored_at, active, kind, user, token_size, token = values
+
+        if kind == _.UUID:
+            user_id = UUID(bytes=user)
+        elif kind == _.OBJECT_ID:
+            user_id = ObjectId(user[:12])
+        else:
+            user_id = int.from_bytes(user[:8], 'little', signed=True)
+
+        return Session(UUID(bytes=session_id),
+                       datetime.utcfromtimestamp(valid_till),
+                       DefaultSessionContainer(user_id),
+                       token[:token_size].decode(),
+                       bool(active))
+
+    async def get_by_id(self, session_id: UUID) -> Optional[Session]:
+        _, values = self._find(session_id)
+        return self._unpack(values) if values else None
+
+    async def get_recent_by_id(self, session_id: UUID, max_age: float) -> Optional[Session]:
+        _, values = self._find(session_id)
+        return self._unpack(values) if values and values[2] >= time() - max_age else None
+
+    async def insert(self, session: Session):
+        values = self._pack(session)
+        if values is None:
+            return None
+
+        offset, _ = self._find(session.id)
+        if offset is None:
+            now = timegm(datetime.utcnow().utctimetuple())
+            positions = self._positions(session.id)
+            offset = next((position for position in positions if (self._read(position) or (None, 0))[1] < now), positions[0])
+
+        self._write(offset, values)
+
+        return session.id
+
+    async def update_active_valid_till_by_id(self, valid_till: datetime, session_id: UUID) -> Optional[Session]:
+        offset, values = self._find(session_id)
+        if values is None:
+            return None
+
+        session = self._unpack(values)
+        if not session.active or session.valid_till < datetime.utcnow():
+            return None
+
+        session.valid_till = valid_till
+        self._write(offset, self._pack(session, values[2]))
+
+        return session
+
+    async def delete_by_id(self, session_id: UUID) -> bool:
+        offset, _ = self._find(session_id)
+        if offset is None:
+            return False
+
+        self._write(offset, None)
+        return True
+
+
+class TieredSessionBackend(SessionBackend):
+    """
+    Reads `local` first and `remote` (usually `SessionMongoRepository`) on miss, writes go to both.
+
+    Local copy is trusted for `local_ttl` seconds after it was read from or written to `remote` by any worker
+    sharing `local`, older ones are read from `remote` again, so sessions revoked or extended on other host
+    are seen within `local_ttl`.
+    """
+    __slots__ = ('local', 'remote', 'local_ttl')
+
+    def __init__(self, local: SessionBackend, remote: SessionBackend, local_ttl: float = 10):
+        self.local = local
+        self.remote = remote
+        self.local_ttl = local_ttl
+
+    async def get_by_id(self, session_id: UUID) -> Optional[Session]:
+        session = await self.local.get_recent_by_id(session_id, self.local_ttl)
+        if session is not None:
+            return session
+
+        session = await self.remote.get_by_id(session_id)
+        if session is None:
+            await self.local.delete_by_id(session_id)
+        else:
+            await self.local.insert(session)
+
+        return session
+
+    async def insert(self, session: Session):
+        result = await self.remote.insert(session)
+        await self.local.insert(session)
+
+        return result
+
+    async def update_active_valid_till_by_id(self, valid_till: datetime, session_id: UUID) -> Optional[Session]:
+        session = await self.remote.update_active_valid_till_by_id(valid_till, session_id)
+
+        if session is None:
+            await self.local.delete_by_id(session_id)
+        else:
+            await self.local.insert(session)
+
+        return session
+
+    async def delete_by_id(self, session_id: UUID) -> bool:
+        await self.local.delete_by_id(session_id)
+
+        return await self.remote.delete_by_id(session_id)
@@ -5,9 +5,16 @@ from maio.lib.configs.mongo import (
     MongoJsonMapper
 )
 
+RENEW_THRESHOLD = 1.0
+
 
 class SessionConfig:
-    __slots__ = ('mongo', 'cookie_name', 'cookie_valid', 'secure_token', 'session_valid', 'cookie_secure', 'cookie_samesite')
+    """
+    `renew_threshold` - session validity is extended only when less than this fraction of `session_valid` is left,
+    default `1.0` extends it on every request; with `0.5` it is written about once per half of `session_valid`.
+    `cache_ttl` - seconds validated sessions are kept in process, off by default.
+    """
+    __slots__ = ('mongo', 'cookie_name', 'cookie_valid', 'secure_token', 'session_valid', 'cookie_secure', 'cookie_samesite', 'renew_threshold', 'cache_ttl', 'cache_size')
     mongo: MongoConfig
     cookie_name: str
     cookie_valid: int
@@ -15,6 +22,9 @@ class SessionConfig:
     session_valid: int
     cookie_secure: bool
     cookie_samesite: Optional[str]
+    renew_threshold: float
+    cache_ttl: Optional[int]
+    cache_size: int
 
     def __init__(self,
                  mongo: MongoConfig,
@@ -23,7 +33,10 @@ class SessionConfig:
                  secure_token: str,
                  session_valid: int,
                  cookie_secure: bool,
-                 cookie_samesite: Optional[str] = None):
+                 cookie_samesite: Optional[str] = None,
+                 renew_threshold: float = RENEW_THRESHOLD,
+                 cache_ttl: Optional[int] = None,
+                 cache_size: int = 10000):
         self.mongo = mongo
         self.cookie_secure = cookie_secure
         self.cookie_name = cookie_name
@@ -31,6 +44,9 @@ class SessionConfig:
         self.secure_token = secure_token
         self.session_valid = session_valid
         self.cookie_samesite = cookie_samesite
+        self.renew_threshold = renew_threshold
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
 
     @classmethod
     def from_json(cls, json_config: dict):
@@ -49,6 +65,9 @@ class SessionConfigJsonMapper:
         COOKIE_SAMESITE = 'cookieSameSite'
         SECURE_TOKEN = "secureToken"
         SESSION_VALID = "sessionValid"
+        RENEW_THRESHOLD = "renewThreshold"
+        CACHE_TTL = "cacheTtl"
+        CACHE_SIZE = "cacheSize"
 
     @classmethod
     def from_json(cls, json_config: dict) -> SessionConfig:
@@ -60,5 +79,8 @@ class SessionConfigJsonMapper:
         cookie_samesite = json_config.get(_.COOKIE_SAMESITE)
         secure_token = json_config.get(_.SECURE_TOKEN)
         session_valid = int(json_config.get(_.SESSION_VALID))
+        renew_threshold = float(json_config.get(_.RENEW_THRESHOLD, RENEW_THRESHOLD))
+        cache_ttl = int(json_config[_.CACHE_TTL]) if json_config.get(_.CACHE_TTL) else None
+        cache_size = int(json_config.get(_.CACHE_SIZE, 10000))
 
-        return SessionConfig(mongo, cookie_name, cookie_valid, secure_token, session_valid, cookie_secure, cookie_samesite)
+        return SessionConfig(mongo, cookie_name, cookie_valid, secure_token, session_valid, cookie_secure, cookie_samesite, renew_threshold, cache_ttl, cache_size)
@@ -2,18 +2,29 @@ from datetime import datetime
 from typing import (
     Any,
     Dict,
+    List,
     Optional,
     Type
 )
 from uuid import UUID
 
+from pymongo import ReturnDocument
 from pymongo.database import Database
 
-from maio.lib.repository import Mongo
+from maio.lib.indexes import (
+    Index,
+    indexes,
+)
+from maio.lib.repository import (
+    Mongo,
+    raw_collection,
+)
+from maio.lib.session.backend import SessionBackend
 from maio.lib.session.model import (
     DefaultSessionContainer,
     Session
 )
+from maio.lib.write_behind import WriteBehindBuffer
 
 
 class DefaultContainerSessionMongoMapper:
@@ -48,6 +59,11 @@ class AbstractSessionMongoMapper:
         TOKEN = 'token'
         ACTIVE = 'active'
 
+    @classmethod
+    def projection(cls) -> Dict[str, int]:
+        _ = cls.Fields
+        return {_.ID: 1, _.VALID_TILL: 1, _.CONTAINER: 1, _.TOKEN: 1, _.ACTIVE: 1}
+
     @classmethod
     def from_mongo_container(cls, data_container: Any) -> Any:
         raise NotImplementedError
@@ -79,15 +95,44 @@ class AbstractSessionMongoMapper:
         }
 
 
-class SessionMongoRepository:
-    __slots__ = ('collection', 'mapper_class')
+class SessionMongoRepository(SessionBackend):
+    """
+    With `raw` reads return `RawBSONDocument`s limited to mapper projection, so only fields the mapper reads get decoded
+    """
+    __slots__ = ('collection', 'read_collection', 'mapper_class', 'projection')
 
     __collection__ = "sessions"
 
-    def __init__(self, database: Database, mapper_class: Type[AbstractSessionMongoMapper] = AbstractSessionMongoMapper):
+    def __init__(self, database: Database, mapper_class: Type[AbstractSessionMongoMapper] = AbstractSessionMongoMapper, raw: bool = False):
         self.collection = database.get_collection(self.__collection__)
+        self.read_collection = raw_collection(self.collection) if raw else self.collection
+        self.projection = mapper_class.projection() if raw else None
         self.mapper_class = mapper_class
 
+    @classmethod
+    async def ensure_indexes(cls,
+                             database: Database,
+                             mapper_class: Type[AbstractSessionMongoMapper] = AbstractSessionMongoMapper,
+                             ttl: bool = True) -> List[str]:
+        """
+        Index on `valid_till`, with `ttl` server removes expired sessions by itself, without it use `SessionSweeper`.
+        Index is declared in `indexes` registry, index of the other mode left by previous deployment is dropped first.
+        """
+        valid_till = mapper_class.Fields.VALID_TILL
+        ttl_index = Index(valid_till, name=f'{valid_till}_ttl', expire_after=0)
+        plain_index = Index(valid_till)
+        index, replaced = (ttl_index, plain_index) if ttl else (plain_index, ttl_index)
+
+        collection = database.get_collection(cls.__collection__)
+        if replaced.name in await collection.index_information():
+            await collection.drop_index(replaced.name)
+
+        indexes.unregister(cls.__collection__, replaced.name)
+        indexes.register(cls.__collection__, index)
+        created = await indexes.ensure(database, [cls.__collection__])
+
+        return created.get(cls.__collection__, [])
+
     async def get_by_id(self, session_id: UUID) -> Optional[Session]:
         _ = self.mapper_class.Fields
 
@@ -95,7 +140,7 @@ class SessionMongoRepository:
             _.ID: session_id
         }
 
-        result = await self.collection.find_one(query)
+        result = await self.read_collection.find_one(query, self.projection)
 
         if result:
             return self.mapper_class.from_mongo(result)
@@ -122,7 +167,7 @@ class SessionMongoRepository:
 
         update = Mongo.update_set({_.VALID_TILL: valid_till})
 
-        result = await self.collection.find_one_and_update(query, update)
+        result = await self.read_collection.find_one_and_update(query, update, self.projection, return_document=ReturnDocument.AFTER)
 
         if result:
             return self.mapper_class.from_mongo(result)
@@ -133,3 +178,52 @@ class SessionMongoRepository:
         result = await self.collection.insert_one(data)
 
         return result.inserted_id
+
+
+class BufferedSessionMongoRepository(SessionMongoRepository):
+    """
+    Validity renewals are kept in memory and written every `flush_interval_ms` as one `bulk_write`,
+    reads see buffered `valid_till`. Call `start()` on startup and `stop()` on shutdown to write what is left.
+    """
+    __slots__ = ('buffer',)
+
+    def __init__(self,
+                 database: Database,
+                 mapper_class: Type[AbstractSessionMongoMapper] = AbstractSessionMongoMapper,
+                 raw: bool = False,
+                 flush_interval_ms: int = 500,
+                 max_size: int = 10000):
+        super().__init__(database, mapper_class, raw)
+        self.buffer = WriteBehindBuffer(database, max_size, flush_interval_ms / 1000)
+
+    def pending_valid_till(self, session_id: UUID) -> Optional[datetime]:
+        pending = self.buffer.pending(self.__collection__, session_id)
+        if pending:
+            return pending['$max'][self.mapper_class.Fields.VALID_TILL]
+
+    async def get_by_id(self, session_id: UUID) -> Optional[Session]:
+        session = await super().get_by_id(session_id)
+
+        if session:
+            valid_till = self.pending_valid_till(session_id)
+            if valid_till and valid_till > session.valid_till:
+                session.valid_till = valid_till
+
+        return session
+
+    async def update_active_valid_till_by_id(self, valid_till: datetime, session_id: UUID) -> Optional[Session]:
+        session = await self.get_by_id(session_id)
+
+        if not session or not session.active or session.valid_till < datetime.utcnow():
+            return None
+
+        self.buffer.update(self.__collection__, session_id, {'$max': {self.mapper_class.Fields.VALID_TILL: valid_till}})
+        session.valid_till = max(session.valid_till, valid_till)
+
+        return session
+
+    def start(self):
+        self.buffer.start()
+
+    async def stop(self):
+        await self.buffer.stop()
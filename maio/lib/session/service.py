@@ -1,19 +1,39 @@
+import base64
+import hashlib
+import hmac
 import logging
+from calendar import timegm
 from contextlib import asynccontextmanager
 from datetime import (
     datetime,
     timedelta
 )
-from typing import Optional
+from typing import (
+    Any,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional
+)
 from uuid import UUID
 
 from aiohttp.web_request import Request
 from aiohttp.web_response import Response
+from bson import ObjectId
 
+from maio.lib.cached import ReadThroughCache
+from maio.lib.metrics import (
+    MetricsRegistry,
+    metrics,
+)
 from maio.lib.parsers import parse_uuid
+from maio.lib.session.backend import SessionBackend
 from maio.lib.session.config import SessionConfig
-from maio.lib.session.model import Session
-from maio.lib.session.repository import SessionMongoRepository
+from maio.lib.session.model import (
+    DefaultSessionContainer,
+    Session
+)
 
 logger = logging.getLogger('session')
 
@@ -69,6 +89,15 @@ class SessionStore:
     def get_by_id(self, request: Request) -> Optional[str]:
         raise NotImplementedError
 
+    def get_session(self, request: Request) -> Optional[Session]:
+        """
+        Session trusted without looking into repository, `None` when store cannot provide one
+        """
+        return None
+
+    def revoke(self, key: Hashable, until: datetime):
+        pass
+
     def add_to_response(self, response: Response, session: Session):
         raise NotImplementedError
 
@@ -91,9 +120,12 @@ class CookieSessionStore(SessionStore):
         return session_id
 
     def add_to_response(self, response: Response, session: Session):
+        self._set_cookie(response, str(session.id))
+
+    def _set_cookie(self, response: Response, value: str):
         # noinspection PyTypeChecker
         response.set_cookie(self.cookie_name,
-                            str(session.id),
+                            value,
                             max_age=86400,
                             secure=self.session_config.cookie_secure,
                             httponly=self.session_config.cookie_secure,
@@ -128,36 +160,249 @@ class HeaderSessionStore(SessionStore):
             pass
 
 
+class RevocationList:
+    """
+    Session or user ids whose signed tokens must not be trusted until given time, local to process
+    """
+    __slots__ = ('_revoked', '_next_prune')
+
+    def __init__(self):
+        self._revoked: Dict[Hashable, datetime] = {}
+        self._next_prune = datetime.utcnow()
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def revoke(self, key: Hashable, until: datetime):
+        self._revoked[key] = max(until, self._revoked.get(key, until))
+        self._prune()
+
+    def is_revoked(self, key: Hashable) -> bool:
+        until = self._revoked.get(key)
+        return until is not None and until > datetime.utcnow()
+
+    def _prune(self):
+        now = datetime.utcnow()
+        if now < self._next_prune:
+            return
+
+        self._revoked = {key: until for key, until in self._revoked.items() if until > now}
+        self._next_prune = now + timedelta(minutes=1)
+
+
+def _encode(value: bytes) -> str:
+    return base64.urlsafe_b64encode(value).rstrip(b'=').decode()
+
+
+def _decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+
+class SignedSession(Session):
+    """
+    Session restored from signed cookie, holds only digest of session token
+    """
+    __slots__ = ('token_digest',)
+
+    def __init__(self, id: UUID, valid_till: datetime, container: DefaultSessionContainer, token_digest: str, active: bool):
+        super().__init__(id, valid_till, container, None, active)
+        self.token_digest = token_digest
+
+    @staticmethod
+    def digest(token: Optional[str]) -> str:
+        return _encode(hashlib.sha256(token.encode()).digest()[:16]) if token else ''
+
+    def is_valid(self, token):
+        return bool(token) and bool(self.token_digest) and hmac.compare_digest(self.digest(token), self.token_digest)
+
+
+class SignedTokenSessionStore(CookieSessionStore):
+    """
+    Cookie holds session id, user id, active flag, expiry and digest of session token signed with HMAC-SHA256 of `secure_token`,
+    so `SessionManager` trusts it without repository lookup until it needs renewal or gets revoked.
+    Only sessions with `DefaultSessionContainer` are trusted this way, others are always read from repository.
+    Tokens signed with `previous_tokens` are still accepted, which allows rotating the key.
+    Handlers should call `SessionManager.add_to_response` after renewal to issue token with new expiry.
+    """
+    __slots__ = ('keys', 'revocations')
+
+    SEPARATOR = '|'
+    UNTRUSTED = '-'
+
+    def __init__(self,
+                 session_config: SessionConfig,
+                 suffix: str,
+                 previous_tokens: Iterable[str] = (),
+                 revocations: Optional[RevocationList] = None):
+        super().__init__(session_config, suffix)
+        self.keys = {}
+        for token in (session_config.secure_token, *previous_tokens):
+            key = token.encode()
+            self.keys.setdefault(hashlib.sha256(key).hexdigest()[:8], key)
+        self.revocations = revocations
+
+    def _dump_user_id(self, session: Session) -> str:
+        user_id = session.user_id
+        if type(session.container) is not DefaultSessionContainer:
+            return self.UNTRUSTED
+        if isinstance(user_id, UUID):
+            return f'u{user_id.hex}'
+        if isinstance(user_id, ObjectId):
+            return f'o{user_id}'
+        if isinstance(user_id, int):
+            return f'i{user_id}'
+        return self.UNTRUSTED
+
+    @staticmethod
+    def _load_user_id(value: str) -> Any:
+        kind, value = value[0], value[1:]
+        if kind == 'u':
+            return UUID(value)
+        if kind == 'o':
+            return ObjectId(value)
+        return int(value)
+
+    def _sign(self, key_id: str, payload: str) -> str:
+        return _encode(hmac.new(self.keys[key_id], f'{key_id}.{payload}'.encode(), hashlib.sha256).digest())
+
+    def dump(self, session: Session) -> str:
+        key_id = next(iter(self.keys))
+        payload = self.SEPARATOR.join((session.id.hex,
+                                       self._dump_user_id(session),
+                                       '1' if session.active else '0',
+                                       str(timegm(session.valid_till.utctimetuple())),
+                                       session.token_digest if isinstance(session, SignedSession) else SignedSession.digest(session.token)))
+        payload = _encode(payload.encode())
+
+        return f'{key_id}.{payload}.{self._sign(key_id, payload)}'
+
+    def _verify(self, token: str) -> Optional[List[str]]:
+        try:
+            key_id, payload, signature = token.split('.')
+            if key_id not in self.keys or not hmac.compare_digest(signature, self._sign(key_id, payload)):
+                return None
+
+            return _decode(payload).decode().split(self.SEPARATOR)
+        except (ValueError, TypeError, UnicodeDecodeError):
+            return None
+
+    def load(self, token: str) -> Optional[SignedSession]:
+        """
+        Session from signed token, `None` when token is invalid or session has to be read from repository
+        """
+        fields = self._verify(token)
+        if not fields or fields[1] == self.UNTRUSTED:
+            return None
+
+        try:
+            session_id, user_id, active, valid_till, token_digest = fields
+
+            return SignedSession(UUID(session_id),
+                                 datetime.utcfromtimestamp(int(valid_till)),
+                                 DefaultSessionContainer(self._load_user_id(user_id)),
+                                 token_digest,
+                                 active == '1')
+        except (ValueError, TypeError):
+            return None
+
+    def get_by_id(self, request: Request) -> Optional[str]:
+        token = request.cookies.get(self.cookie_name, None)
+        fields = self._verify(token) if token else None
+
+        return fields[0] if fields else None
+
+    def get_session(self, request: Request) -> Optional[Session]:
+        token = request.cookies.get(self.cookie_name, None)
+        session = self.load(token) if token else None
+
+        if not session or session.valid_till < datetime.utcnow():
+            return None
+
+        if self.revocations is not None and (self.revocations.is_revoked(session.id) or self.revocations.is_revoked(session.user_id)):
+            return None
+
+        return session
+
+    def revoke(self, key: Hashable, until: datetime):
+        if self.revocations is not None:
+            self.revocations.revoke(key, until)
+
+    def add_to_response(self, response: Response, session: Session):
+        self._set_cookie(response, self.dump(session))
+
+
 class SessionManager:
-    __slots__ = ('client_store', 'repository', 'session_validity')
+    """
+    Sliding expiration: validity is pushed forward only when less than `renew_threshold` of `session_valid` is left,
+    other requests just read the session. Threshold of 1 renews on every request.
 
-    repository: SessionMongoRepository
+    With `cache_ttl` set (and threshold below 1) valid sessions are kept in process for that long, at most half of `session_valid`,
+    so deactivation or deletion done by other workers is noticed after at most `cache_ttl` seconds.
+    """
+    __slots__ = ('client_store', 'repository', 'session_validity', 'renew_before', 'cache')
+
+    repository: SessionBackend
     config: SessionConfig
     name: str
 
     def __init__(self,
                  session_config: SessionConfig,
-                 sessions_repository: SessionMongoRepository,
-                 store: SessionStore):
+                 sessions_repository: SessionBackend,
+                 store: SessionStore,
+                 registry: MetricsRegistry = metrics):
         super().__init__()
         self.session_validity = timedelta(seconds=session_config.session_valid)
+        self.renew_before = self.session_validity * min(session_config.renew_threshold, 1.0)
         self.client_store = store
         self.repository = sessions_repository
+        self.cache = None
+
+        if session_config.cache_ttl:
+            cache_ttl = min(session_config.cache_ttl, session_config.session_valid / 2)
+            self.cache = ReadThroughCache('sessions', cache_ttl, session_config.cache_size, negative_ttl=0, registry=registry)
 
     @asynccontextmanager
     async def session(self, request: Request):
-        session_id = self.client_store.get_by_id(request)
+        session = self.client_store.get_session(request)
+
+        if session and session.active and not self.needs_renewal(session):
+            session_id = session.id
+        else:
+            session_id = self.client_store.get_by_id(request)
+
+            if not session_id:
+                raise SessionNotExistsException
+
+            session_id = parse_uuid(session_id)
 
-        if not session_id:
-            raise SessionNotExistsException
+            if not session_id:
+                raise SessionNotExistsException
 
-        session_id = parse_uuid(session_id)
+            session = await self.get_valid_session(session_id)
 
-        if not session_id:
-            raise SessionNotExistsException
+        try:
+            yield session
+        finally:
+            if session.is_deleted():
+                await self.delete_by_id(session_id)
 
-        valid_till = self.get_validity()
-        session = await self.repository.update_active_valid_till_by_id(valid_till, session_id)
+    async def get_valid_session(self, session_id: UUID) -> Session:
+        if self.renew_before < self.session_validity:
+            if self.cache:
+                session = await self.cache.get(session_id, lambda: self.repository.get_by_id(session_id))
+            else:
+                session = await self.repository.get_by_id(session_id)
+
+            if not session or session.is_deleted() or session.valid_till < datetime.utcnow():
+                raise SessionNotFoundException(session_id)
+
+            if not session.active:
+                raise SessionUserInactiveException
+
+            if not self.needs_renewal(session):
+                return session
+
+        session = await self.repository.update_active_valid_till_by_id(self.get_validity(), session_id)
 
         if not session:
             raise SessionNotFoundException(session_id)
@@ -165,11 +410,32 @@ class SessionManager:
         if not session.active:
             raise SessionUserInactiveException
 
-        try:
-            yield session
-        finally:
-            if session.is_deleted():
-                await self.repository.delete_by_id(session_id)
+        if self.cache:
+            self.cache.cache.set(session_id, session)
+
+        return session
+
+    async def delete_by_id(self, session_id: UUID) -> bool:
+        if self.cache:
+            self.cache.invalidate(session_id)
+
+        self.client_store.revoke(session_id, self.get_validity())
+
+        return await self.repository.delete_by_id(session_id)
+
+    def invalidate_user(self, user_id: Any) -> int:
+        """
+        Drops cached sessions of user, to be called when user gets deactivated
+        """
+        self.client_store.revoke(user_id, self.get_validity())
+
+        if not self.cache:
+            return 0
+
+        return self.cache.invalidate_where(lambda session: session is not None and session.user_id == user_id)
+
+    def needs_renewal(self, session: Session) -> bool:
+        return session.valid_till - datetime.utcnow() < self.renew_before
 
     def get_validity(self):
         return datetime.utcnow() + self.session_validity
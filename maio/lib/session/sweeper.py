@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import (
+    Callable,
+    Type
+)
+
+from pymongo.database import Database
+
+from maio.lib.metrics import (
+    MetricsRegistry,
+    metrics,
+)
+from maio.lib.repository import Mongo
+from maio.lib.session.repository import (
+    AbstractSessionMongoMapper,
+    SessionMongoRepository
+)
+from maio.lib.worker.base import wait_unless_stopped
+
+logger = logging.getLogger('session')
+
+
+class SessionSweeper:
+    """
+    Removes expired sessions where TTL index cannot be used.
+    Deletes at most `batch_size` sessions at once and waits `pause` seconds between batches,
+    so it does not compete with requests for the collection.
+    """
+    __slots__ = ('collection', 'valid_till', 'batch_size', 'pause', 'registry')
+
+    def __init__(self,
+                 database: Database,
+                 mapper_class: Type[AbstractSessionMongoMapper] = AbstractSessionMongoMapper,
+                 batch_size: int = 1000,
+                 pause: float = 0.1,
+                 registry: MetricsRegistry = metrics):
+        self.collection = database.get_collection(SessionMongoRepository.__collection__)
+        self.valid_till = mapper_class.Fields.VALID_TILL
+        self.batch_size = batch_size
+        self.pause = pause
+        self.registry = registry
+
+    async def sweep(self, is_stopped: Callable[[], bool] = lambda: False) -> int:
+        now = datetime.utcnow()
+        query = {self.valid_till: Mongo.match_less_than(now, can_equal=False)}
+        purged = 0
+
+        while not is_stopped():
+            documents = await self.collection.find(query, {'_id': 1}).limit(self.batch_size).to_list(self.batch_size)
+            if not documents:
+                break
+
+            result = await self.collection.delete_many({**query, '_id': Mongo.match_in([document['_id'] for document in documents])})
+            purged += result.deleted_count
+            self.registry.counter('sessions_purged').inc(result.deleted_count)
+
+            if len(documents) < self.batch_size:
+                break
+
+            await asyncio.sleep(self.pause)
+
+        logger.info(f"Purged {purged} expired sessions")
+
+        return purged
+
+    async def run(self, interval: float, is_stopped: Callable[[], bool]):
+        while not is_stopped():
+            await self.sweep(is_stopped)
+            await wait_unless_stopped(interval, is_stopped)
@@ -0,0 +1,251 @@
+import asyncio
+import logging
+from datetime import (
+    datetime,
+    timedelta,
+)
+from time import (
+    monotonic,
+    perf_counter,
+)
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Union,
+)
+from uuid import uuid4
+
+from pymongo import ReturnDocument
+from pymongo.database import Database
+from pymongo.errors import DuplicateKeyError
+
+from maio.lib.aggregation import optimize_pipeline
+from maio.lib.metrics import (
+    MetricsRegistry,
+    metrics,
+)
+from maio.lib.repository import (
+    Mongo,
+    RepositoryException,
+)
+from maio.lib.worker.base import wait_unless_stopped
+
+logger = logging.getLogger('views')
+
+
+class StaleViewException(RepositoryException):
+    __slots__ = ('name', 'refreshed_at')
+
+    def __init__(self, name: str, refreshed_at: Optional[datetime]):
+        self.name = name
+        self.refreshed_at = refreshed_at
+
+
+class MaterializedView:
+    """
+    Results of aggregation pipeline stored in `target` collection with `$merge`.
+
+    With `watermark_field` each refresh aggregates only source documents added since previous refresh
+    (`watermark_field` must grow monotonically, e.g. ObjectId or creation date) and `when_matched` has to be given:
+    `'replace'` is right only when groups are partitioned by the watermark (per day, per hour),
+    otherwise use `MaterializedView.additive([...])` so partial results are added up.
+
+    Refresh takes lease on view state document first, so only one process refreshes the view at a time;
+    lease of crashed process expires after `lease_ttl` seconds.
+    """
+    __slots__ = ('name', 'source', 'pipeline', 'target', 'watermark_field', 'merge_on', 'when_matched', 'lease_ttl', 'registry', '_lock')
+
+    __state_collection__ = 'materialized_views'
+
+    class Fields:
+        __slots__ = ()
+        ID = '_id'
+        WATERMARK = 'watermark'
+        REFRESHED_AT = 'refreshed_at'
+        DURATION_MS = 'duration_ms'
+        LEASE_OWNER = 'lease_owner'
+        LEASE_UNTIL = 'lease_until'
+
+    def __init__(self,
+                 name: str,
+                 source: str,
+                 pipeline: Mongo.Pipeline,
+                 target: str,
+                 watermark_field: Optional[str] = None,
+                 merge_on: Union[str, List[str]] = '_id',
+                 when_matched: Union[str, List[Dict], None] = None,
+                 lease_ttl: float = 300,
+                 registry: MetricsRegistry = metrics):
+        if when_matched is None:
+            if watermark_field:
+                raise ValueError(f"View {name} refreshed by {watermark_field} needs explicit when_matched")
+            when_matched = 'replace'
+
+        self.name = name
+        self.source = source
+        self.pipeline = pipeline
+        self.target = target
+        self.watermark_field = watermark_field
+        self.merge_on = merge_on
+        self.when_matched = when_matched
+        self.lease_ttl = lease_ttl
+        self.registry = registry
+        self._lock: Optional[asyncio.Lock] = None
+
+    @staticmethod
+    def additive(fields: Iterable[str]) -> List[Dict]:
+        return [{'$set': {field: {'$add': [{'$ifNull': [f'${field}', 0]}, f'$$new.{field}']} for field in fields}}]
+
+    async def state(self, database: Database) -> Optional[Dict[str, Any]]:
+        return await database.get_collection(self.__state_collection__).find_one({self.Fields.ID: self.name})
+
+    async def _acquire(self, database: Database, owner: str) -> Optional[Dict[str, Any]]:
+        _ = self.Fields
+        now = datetime.utcnow()
+
+        try:
+            return await database.get_collection(self.__state_collection__).find_one_and_update(
+                {_.ID: self.name, '$or': [{_.LEASE_UNTIL: None}, {_.LEASE_UNTIL: Mongo.match_less_than(now, can_equal=False)}]},
+                Mongo.update_set({_.LEASE_OWNER: owner, _.LEASE_UNTIL: now + timedelta(seconds=self.lease_ttl)}),
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # state document exists and its lease is held by someone else
+            return None
+
+    async def _release(self, database: Database, owner: str, changes: Optional[Dict[str, Any]] = None):
+        _ = self.Fields
+        update = {'$unset': {_.LEASE_OWNER: '', _.LEASE_UNTIL: ''}}
+        if changes:
+            update['$set'] = changes
+
+        await database.get_collection(self.__state_collection__).update_one({_.ID: self.name, _.LEASE_OWNER: owner}, update)
+
+    async def refresh(self, database: Database, full: bool = False) -> Optional[datetime]:
+        """
+        Returns time the refresh started at, `None` when other process is refreshing the view
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            owner = uuid4().hex
+            state = await self._acquire(database, owner)
+            if state is None:
+                return None
+
+            changes = None
+            try:
+                changes = await self._refresh(database, state, full)
+                return changes[self.Fields.REFRESHED_AT]
+            finally:
+                await self._release(database, owner, changes)
+
+    async def _refresh(self, database: Database, state: Dict[str, Any], full: bool) -> Dict[str, Any]:
+        _ = self.Fields
+        started_at = datetime.utcnow()
+        started = perf_counter()
+        source = database.get_collection(self.source)
+
+        stages = []
+        watermark = None
+
+        if self.watermark_field:
+            last = None if full else state.get(_.WATERMARK)
+
+            latest = await source.find_one({}, {self.watermark_field: 1}, sort=[(self.watermark_field, -1)])
+            watermark = latest.get(self.watermark_field) if latest else None
+
+            if watermark is None or watermark == last:
+                return self._refreshed(last, started_at, started)
+
+            window = Mongo.match_less_than(watermark)
+            if last is not None:
+                window.update(Mongo.match_greater_than(last, can_equal=False))
+            stages.append({'$match': {self.watermark_field: window}})
+
+        stages.extend(self.pipeline.get())
+        stages.append({'$merge': {
+            'into': self.target,
+            'on': self.merge_on,
+            'whenMatched': self.when_matched,
+            'whenNotMatched': 'insert'
+        }})
+
+        if self.pipeline.optimize:
+            stages = optimize_pipeline(stages)
+
+        await source.aggregate(stages).to_list(None)
+
+        return self._refreshed(watermark, started_at, started)
+
+    def _refreshed(self, watermark: Any, started_at: datetime, started: float) -> Dict[str, Any]:
+        _ = self.Fields
+        duration = (perf_counter() - started) * 1000
+
+        self.registry.histogram('materialized_view_refresh_ms', view=self.name).observe(duration)
+        logger.info(f"View {self.name} refreshed [{duration} ms]")
+
+        return {_.WATERMARK: watermark, _.REFRESHED_AT: started_at, _.DURATION_MS: duration}
+
+    async def read(self,
+                   database: Database,
+                   query: Optional[Dict] = None,
+                   max_staleness: Optional[timedelta] = None,
+                   projection: Optional[Dict[str, int]] = None,
+                   wait: float = 30,
+                   poll_interval: float = 0.5):
+        """
+        Returns cursor over view, refreshing it first when last refresh is older than `max_staleness`.
+        When other process is refreshing the view at the moment, waits up to `wait` seconds for its refresh
+        to land and raises `StaleViewException` if it does not.
+        """
+        if max_staleness is not None:
+            await self._ensure_fresh(database, max_staleness, wait, poll_interval)
+
+        return database.get_collection(self.target).find(query or {}, projection)
+
+    async def _ensure_fresh(self, database: Database, max_staleness: timedelta, wait: float, poll_interval: float):
+        deadline = monotonic() + wait
+
+        while True:
+            state = await self.state(database)
+            refreshed_at = state.get(self.Fields.REFRESHED_AT) if state else None
+
+            if refreshed_at is not None and refreshed_at >= datetime.utcnow() - max_staleness:
+                return
+            if await self.refresh(database) is not None:
+                return
+            if monotonic() >= deadline:
+                raise StaleViewException(self.name, refreshed_at)
+
+            await asyncio.sleep(poll_interval)
+
+
+class ViewRefresher:
+    """
+    Refreshes views every `interval` seconds, meant to run inside `WorkerApplication`
+    """
+    __slots__ = ('database', 'views', 'interval')
+
+    def __init__(self, database: Database, views: Iterable[MaterializedView], interval: float):
+        self.database = database
+        self.views = list(views)
+        self.interval = interval
+
+    async def refresh_all(self):
+        for view in self.views:
+            try:
+                await view.refresh(self.database)
+            except Exception as exception:
+                logger.error(f"Refresh of view {view.name} failed", exc_info=exception)
+
+    async def run(self, is_stopped: Callable[[], bool]):
+        while not is_stopped():
+            await self.refresh_all()
+            await wait_unless_stopped(self.interval, is_stopped)
@@ -1,8 +1,12 @@
 import argparse
+import asyncio
 import logging
 import signal
 from logging import Logger
+from time import monotonic
 from typing import (
+    Awaitable,
+    Callable,
     Dict,
     Type
 )
@@ -10,14 +14,27 @@ from typing import (
 from maio.lib.configs.app import AppConfig
 
 
+async def wait_unless_stopped(interval: float, is_stopped: Callable[[], bool], step: float = 1.0):
+    """
+    Sleeps `interval` seconds in `step` long parts, returning early once `is_stopped()` is true
+    """
+    deadline = monotonic() + interval
+    while not is_stopped():
+        remaining = deadline - monotonic()
+        if remaining <= 0:
+            return
+        await asyncio.sleep(min(step, remaining))
+
+
 class WorkerApplication:
-    __slots__ = ('config', 'terminated', 'interrupted', 'logger')
+    __slots__ = ('config', 'terminated', 'interrupted', 'logger', 'shutdown_callbacks')
 
     def __init__(self, config: AppConfig, logger: Logger):
         self.config = config
         self.terminated = False
         self.interrupted = False
         self.logger = logger
+        self.shutdown_callbacks = []
 
         signal.signal(signal.SIGTERM, self.signal_term)
         signal.signal(signal.SIGINT, self.signal_int)
@@ -25,6 +42,29 @@ class WorkerApplication:
     def run(self):
         raise NotImplementedError
 
+    def on_shutdown(self, callback: Callable[[], Awaitable]):
+        """
+        Callbacks run after `run()` returns, or inside the loop of `run_async()` for ones bound to that loop
+        """
+        self.shutdown_callbacks.append(callback)
+
+    def run_async(self, main: Awaitable):
+        async def run():
+            try:
+                await main
+            finally:
+                await self.shutdown()
+
+        asyncio.run(run())
+
+    async def shutdown(self):
+        callbacks, self.shutdown_callbacks = self.shutdown_callbacks, []
+        for callback in callbacks:
+            try:
+                await callback()
+            except Exception as exception:
+                self.logger.error("Shutdown callback failed", exc_info=exception)
+
     def signal_term(self, *args):
         self.logger.info("Received signal terminate")
         self.terminated = True
@@ -69,7 +109,12 @@ class WorkerBootstrap:
             config = self.config.from_json(cmd_args.config)
 
             application = self.applications.get(cmd_args.command) if self.applications else self.application
-            application(config).run()
+            instance = application(config)
+            try:
+                instance.run()
+            finally:
+                if instance.shutdown_callbacks:
+                    asyncio.run(instance.shutdown())
 
         else:
             self.parser.print_usage()
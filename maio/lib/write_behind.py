@@ -0,0 +1,221 @@
+import asyncio
+import logging
+from time import perf_counter
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from pymongo import UpdateOne
+from pymongo.database import Database
+
+from maio.lib.metrics import (
+    MetricsRegistry,
+    metrics,
+)
+
+logger = logging.getLogger('write_behind')
+
+_SET = '$set'
+_INC = '$inc'
+_MAX = '$max'
+_MIN = '$min'
+
+_SUPPORTED = {_SET, _INC, _MAX, _MIN}
+
+
+def _overlaps(first: str, second: str) -> bool:
+    return first == second or first.startswith(f'{second}.') or second.startswith(f'{first}.')
+
+
+def _fold(operator: str, current: Any, value: Any) -> Any:
+    if operator == _INC:
+        return current + value
+    if operator == _MAX:
+        return max(current, value)
+    return min(current, value)
+
+
+def _foldable(operator: str, current: Any, value: Any) -> bool:
+    # Mongo orders mixed types and `None` by BSON type, leave such values for it to compare
+    try:
+        _fold(operator, current, value)
+        return True
+    except TypeError:
+        return False
+
+
+def conflicts(target: Dict[str, Dict], update: Dict[str, Dict]) -> bool:
+    """
+    Tells if `update` cannot be folded into `target` without Mongo rejecting result as path conflict:
+    different operators among `$inc`/`$max`/`$min` on the same field, or operators on parent and child paths.
+    Values Python cannot add up or compare, e.g. `None` or mixed types, conflict as well.
+    """
+    for operator, changes in update.items():
+        for field, value in changes.items():
+            for other, other_changes in target.items():
+                for other_field, other_value in other_changes.items():
+                    if not _overlaps(field, other_field):
+                        continue
+                    if field != other_field:
+                        return True
+                    if operator != other and operator != _SET and other != _SET:
+                        return True
+                    if operator != _SET and not _foldable(operator, other_value, value):
+                        return True
+    return False
+
+
+def merge_update(target: Dict[str, Dict], update: Dict[str, Dict]) -> Dict[str, Dict]:
+    """
+    Folds `update` into `target` as if both were applied one after another.
+    `$inc` values are summed, the last `$set` wins, `$max`/`$min` keep the extreme value.
+    Check `conflicts()` first, conflicting updates are not folded correctly.
+    """
+    for operator, changes in update.items():
+        if operator not in _SUPPORTED:
+            raise ValueError(f"Operator {operator} cannot be buffered")
+
+        for field, value in changes.items():
+            current_set = target.get(_SET)
+
+            if operator == _SET:
+                for other in (_INC, _MAX, _MIN):
+                    if field in target.get(other, ()):
+                        del target[other][field]
+                        if not target[other]:
+                            del target[other]
+                target.setdefault(_SET, {})[field] = value
+
+            elif current_set is not None and field in current_set:
+                current_set[field] = _fold(operator, current_set[field], value)
+
+            else:
+                fields = target.setdefault(operator, {})
+                fields[field] = _fold(operator, fields[field], value) if field in fields else value
+
+    return target
+
+
+class WriteBehindBuffer:
+    """
+    Buffers small updates per collection and `_id` and writes them as one `bulk_write` per collection.
+
+    Update that `conflicts()` with buffered one seals the buffered one, sealed updates are written first with ordered `bulk_write`.
+    Flush happens every `interval` seconds once `start()` was called, or as soon as `max_size` updates wait;
+    flushes run one at a time, so later updates of a document never reach Mongo before earlier ones.
+    `stop()` flushes what is left - register it with `WorkerApplication.on_shutdown`,
+    or with aiohttp as `app.on_shutdown.append(lambda app: buffer.stop())`.
+    Failed flushes are logged and counted, their updates are not retried.
+    """
+    __slots__ = ('database', 'max_size', 'interval', 'upsert', 'registry', '_pending', '_sealed', '_size', '_task', '_flushes', '_lock')
+
+    def __init__(self, database: Database, max_size: int = 1000, interval: float = 1.0, upsert: bool = False, registry: MetricsRegistry = metrics):
+        self.database = database
+        self.max_size = max_size
+        self.interval = interval
+        self.upsert = upsert
+        self.registry = registry
+        self._pending: Dict[str, Dict[Any, Dict]] = {}
+        self._sealed: Dict[str, List[Tuple[Any, Dict]]] = {}
+        self._size = 0
+        self._task: Optional[asyncio.Task] = None
+        self._flushes = set()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def set(self, collection: str, object_id: Any, changes: Dict[str, Any]):
+        self.update(collection, object_id, {_SET: changes})
+
+    def inc(self, collection: str, object_id: Any, changes: Dict[str, Any]):
+        self.update(collection, object_id, {_INC: changes})
+
+    def update(self, collection: str, object_id: Any, update: Dict[str, Dict]):
+        if not _SUPPORTED.issuperset(update):
+            raise ValueError(f"Operators {set(update) - _SUPPORTED} cannot be buffered")
+
+        documents = self._pending.setdefault(collection, {})
+
+        for operator, changes in update.items():
+            single = {operator: changes}
+            current = documents.get(object_id)
+
+            if current is not None and conflicts(current, single):
+                self._sealed.setdefault(collection, []).append((object_id, current))
+                current = None
+
+            if current is None:
+                current = documents[object_id] = {}
+                self._size += 1
+                self.registry.gauge('write_behind_depth', collection=collection).inc()
+
+                if self._size == self.max_size:
+                    self._schedule_flush()
+
+            merge_update(current, single)
+
+    def pending(self, collection: str, object_id: Any) -> Optional[Dict[str, Dict]]:
+        return self._pending.get(collection, {}).get(object_id)
+
+    def _schedule_flush(self):
+        task = asyncio.ensure_future(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            pending, self._pending = self._pending, {}
+            sealed, self._sealed = self._sealed, {}
+            self._size = 0
+
+            for collection in {*sealed, *pending}:
+                # sealed updates precede pending ones for the same document, so they go first and in order
+                if sealed.get(collection):
+                    await self._write(collection, sealed[collection], True)
+                if pending.get(collection):
+                    await self._write(collection, list(pending[collection].items()), False)
+
+    async def _write(self, collection: str, updates: List[Tuple[Any, Dict]], ordered: bool):
+        self.registry.gauge('write_behind_depth', collection=collection).dec(len(updates))
+        operations = [UpdateOne({'_id': object_id}, update, upsert=self.upsert) for object_id, update in updates]
+
+        started = perf_counter()
+        try:
+            await self.database.get_collection(collection).bulk_write(operations, ordered=ordered)
+            self.registry.counter('write_behind_flushed', collection=collection).inc(len(operations))
+        except Exception as exception:
+            logger.error(f"Flush of {len(operations)} updates to {collection} failed", exc_info=exception)
+            self.registry.counter('write_behind_failed', collection=collection).inc(len(operations))
+        finally:
+            self.registry.histogram('write_behind_flush_ms', collection=collection).observe((perf_counter() - started) * 1000)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+        await self.flush()